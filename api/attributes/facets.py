@@ -0,0 +1,45 @@
+# Materialized attribute facet counts, maintained by the attribute write paths
+from collections import Counter
+from typing import Iterable, Mapping, Tuple
+
+from importlib import import_module
+
+from sqlalchemy import bindparam
+
+from attributes.model import AttributeFacet
+
+_facets = AttributeFacet.__table__
+
+
+def _upsert_statement(dialect_name: str):
+    # INSERT ... ON CONFLICT DO UPDATE is spelled the same by both dialects, so one
+    # executemany adds every delta whether or not the pair has a row yet. The
+    # dialect module is imported here so only the backend in use gets loaded.
+    dialect = import_module(f"sqlalchemy.dialects.{dialect_name}")
+    stmt = dialect.insert(_facets).values(
+        name=bindparam("name"), value=bindparam("value"), count=bindparam("delta")
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[_facets.c.name, _facets.c.value],
+        set_={"count": _facets.c.count + stmt.excluded.count},
+    )
+
+
+def facet_counts(attributes: Iterable) -> Counter:
+    """Count ``(name, value)`` pairs of attribute rows or schemas."""
+    return Counter((a.name, a.value) for a in attributes)
+
+
+def facet_deltas(before: Counter, after: Counter) -> dict:
+    """Signed per-pair difference between two :func:`facet_counts` results."""
+    deltas = dict(after)
+    for pair, n in before.items():
+        deltas[pair] = deltas.get(pair, 0) - n
+    return {pair: delta for pair, delta in deltas.items() if delta}
+
+
+async def adjust_facets(db, deltas: Mapping[Tuple[str, str], int]):
+    """Add ``deltas[(name, value)]`` to each facet count in the caller's transaction."""
+    rows = [{"name": name, "value": value, "delta": delta} for (name, value), delta in deltas.items() if delta]
+    if rows:
+        await db.execute(_upsert_statement(db.bind.dialect.name), rows)
@@ -1,13 +1,23 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from db.session import Base
 
 
 class Attribute(Base):
     __tablename__ = "attributes"
+    # Name lookups use the leftmost columns of the composite index; carrying
+    # product_id makes attribute filters index-only
+    __table_args__ = (Index("ix_attributes_name_value_product", "name", "value", "product_id"),)
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    name = Column(String)
     value = Column(String)
-    product_id = Column(Integer, ForeignKey("products.id"))
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     product = relationship("Product", back_populates="attributes")
 
+
+class AttributeFacet(Base):
+    """Materialized number of attribute rows per name/value pair, for facet menus."""
+    __tablename__ = "attribute_facets"
+    name = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
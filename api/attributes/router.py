@@ -1,84 +1,202 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-
-from core.dependencies import get_db
-from attributes.model import Attribute
-from attributes.schemas import AttributeCreate, AttributeOut
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from core.dependencies import get_db, get_read_db
+from attributes.model import Attribute, AttributeFacet
+from attributes.facets import adjust_facets
+from attributes.schemas import AttributeCreate, AttributeOut, AttributeBatch, Facet, FacetValue
+from core.config import ATTRIBUTE_INDEX, PRODUCT_INDEX, FAST_SERIALIZATION
+from services.indexing import index_outbox
 from services.meili import meili_service
+from services.cache import entity_cache
+from services.documents import attribute_document, load_product_document
+from shared.schemas import SearchPage
+from shared.pagination import (
+    keyset_page,
+    keyset_rows,
+    page_response,
+    parse_fields,
+    rows_response,
+    schema_columns,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+)
+from shared.export import export_response, EXPORT_CHUNK_SIZE, EXPORT_FORMAT_PATTERN
+from shared.cache import cached_entity
+from shared.batch import IDS_QUERY, parse_ids, load_by_ids
+from shared.search import search_page, MAX_SEARCH_LIMIT
 
 router = APIRouter(prefix="/attributes", tags=["attributes"])
 
 
+async def queue_product_reindex(db: AsyncSession, product_id: int):
+    # Product documents embed their attributes, so the parent must be re-indexed too
+    product_doc = await load_product_document(db, product_id)
+    if product_doc is not None:
+        await index_outbox.upsert(db, PRODUCT_INDEX, [product_doc])
+
+
 @router.get("/", response_model=List[AttributeOut])
-def list_attributes(db: Session = Depends(get_db)):
-    return db.query(Attribute).all()
+async def list_attributes(
+        request: Request,
+        response: Response,
+        cursor: Optional[int] = Query(None, description="Return items with id greater than this"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+        db: AsyncSession = Depends(get_read_db),
+):
+    selected = parse_fields(fields, AttributeOut)
+    if FAST_SERIALIZATION:
+        stmt = select(*schema_columns(Attribute, AttributeOut, selected))
+        rows, next_cursor = await keyset_rows(db, stmt, Attribute.id, cursor, limit)
+        return rows_response(request, rows, next_cursor)
+    items, next_cursor = await keyset_page(db, select(Attribute), Attribute.id, cursor, limit)
+    return page_response(request, response, items, next_cursor, AttributeOut, selected)
 
 
 @router.post("/", response_model=AttributeOut)
-def create_attribute(
-        attribute: AttributeCreate, product_id: int, db: Session = Depends(get_db)
+async def create_attribute(
+        attribute: AttributeCreate, product_id: int, db: AsyncSession = Depends(get_db)
 ):
     db_attr = Attribute(
         name=attribute.name, value=attribute.value, product_id=product_id
     )
     db.add(db_attr)
-    db.commit()
-    db.refresh(db_attr)
-
-    # Index in Meilisearch
-    attribute_data = [
-        {
-            "id": db_attr.id,
-            "name": db_attr.name,
-            "value": db_attr.value,
-            "product_id": db_attr.product_id,
-        }
-    ]
-    meili_service.add_attributes(attribute_data)
+    await db.flush()  # get id for the outbox row
+    await adjust_facets(db, {(db_attr.name, db_attr.value): 1})
+
+    # Record Meilisearch change in the outbox, same transaction
+    await index_outbox.upsert(db, ATTRIBUTE_INDEX, [attribute_document(db_attr)])
+    await queue_product_reindex(db, db_attr.product_id)
+    await db.commit()
+    index_outbox.notify()
+    await entity_cache.invalidate(entity_cache.key("products", db_attr.product_id))
 
     return db_attr
 
 
+@router.get("/search", response_model=SearchPage)
+async def search_attributes(
+        q: str = "",
+        limit: int = Query(20, ge=1, le=MAX_SEARCH_LIMIT),
+        offset: int = Query(0, ge=0),
+        attributes_to_retrieve: Optional[List[str]] = Query(None, alias="attributesToRetrieve"),
+        product_id: Optional[int] = None,
+):
+    filters = [f"product_id = {product_id}"] if product_id is not None else []
+    return await search_page(
+        meili_service.search_attributes,
+        q,
+        limit=limit,
+        offset=offset,
+        attributes_to_retrieve=attributes_to_retrieve,
+        filters=filters,
+    )
+
+
+@router.get("/export")
+async def export_attributes(
+        fmt: str = Query("ndjson", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+        product_id: Optional[int] = None,
+):
+    async def rows(db: AsyncSession):
+        stmt = select(Attribute)
+        if product_id is not None:
+            stmt = stmt.where(Attribute.product_id == product_id)
+        stmt = stmt.order_by(Attribute.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        async for a in await db.stream_scalars(stmt):
+            yield {"id": a.id, "name": a.name, "value": a.value, "product_id": a.product_id}
+
+    return export_response(rows, fmt, ["id", "name", "value", "product_id"], "attributes")
+
+
+@router.get("/facets", response_model=List[Facet])
+async def attribute_facets(
+        name: Optional[List[str]] = Query(None, description="Attribute names to include, repeatable"),
+        limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE, description="Most common values per name"),
+        db: AsyncSession = Depends(get_read_db),
+):
+    # Reads the materialized counts, not the attributes table; the top ``limit``
+    # values per name are picked in SQL so high-cardinality names stay cheap
+    order = (AttributeFacet.count.desc(), AttributeFacet.value)
+    ranked = select(
+        AttributeFacet.name,
+        AttributeFacet.value,
+        AttributeFacet.count,
+        func.row_number().over(partition_by=AttributeFacet.name, order_by=order).label("rank"),
+    ).where(AttributeFacet.count > 0)
+    if name:
+        ranked = ranked.where(AttributeFacet.name.in_(name))
+    ranked = ranked.subquery()
+    stmt = (
+        select(ranked.c.name, ranked.c.value, ranked.c.count)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.name, ranked.c.rank)
+    )
+    facets = {}
+    for row in await db.execute(stmt):
+        facets.setdefault(row.name, []).append(FacetValue(value=row.value, count=row.count))
+    return [Facet(name=n, values=v) for n, v in facets.items()]
+
+
+@router.get("/batch", response_model=AttributeBatch)
+async def get_attributes_batch(ids: str = IDS_QUERY, db: AsyncSession = Depends(get_read_db)):
+    items, missing = await load_by_ids(db, select(Attribute), Attribute.id, parse_ids(ids))
+    return AttributeBatch(items=items, missing=missing)
+
+
 @router.get("/{attribute_id}", response_model=AttributeOut)
-def get_attribute(attribute_id: int, db: Session = Depends(get_db)):
-    attr = db.query(Attribute).filter(Attribute.id == attribute_id).first()
-    if not attr:
-        raise HTTPException(status_code=404, detail="Attribute not found")
-    return attr
+async def get_attribute(attribute_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    # Misses fill the cache from the primary, since a lagging replica's row (and ETag)
+    # would be served until CACHE_TTL; the session only connects on a miss
+    return await cached_entity(
+        request,
+        "attributes",
+        attribute_id,
+        lambda: db.get(Attribute, attribute_id),
+        AttributeOut,
+        "Attribute not found",
+    )
 
 
 @router.put("/{attribute_id}", response_model=AttributeOut)
-def update_attribute(attribute_id: int, attribute: AttributeCreate, db: Session = Depends(get_db)):
-    db_attr = db.query(Attribute).filter(Attribute.id == attribute_id).first()
+async def update_attribute(attribute_id: int, attribute: AttributeCreate, db: AsyncSession = Depends(get_db)):
+    db_attr = await db.get(Attribute, attribute_id)
     if not db_attr:
         raise HTTPException(status_code=404, detail="Attribute not found")
 
+    if (db_attr.name, db_attr.value) != (attribute.name, attribute.value):
+        await adjust_facets(db, {(db_attr.name, db_attr.value): -1, (attribute.name, attribute.value): 1})
     db_attr.name = attribute.name
     db_attr.value = attribute.value
-    db.commit()
-    db.refresh(db_attr)
-
-    meili_service.add_attributes([
-        {
-            "id": db_attr.id,
-            "name": db_attr.name,
-            "value": db_attr.value,
-            "product_id": db_attr.product_id,
-        }
-    ])
+
+    await index_outbox.upsert(db, ATTRIBUTE_INDEX, [attribute_document(db_attr)])
+    await queue_product_reindex(db, db_attr.product_id)
+    await db.commit()
+    index_outbox.notify()
+    await entity_cache.invalidate(
+        entity_cache.key("attributes", attribute_id), entity_cache.key("products", db_attr.product_id)
+    )
 
     return db_attr
 
 
 @router.delete("/{attribute_id}", status_code=204)
-def delete_attribute(attribute_id: int, db: Session = Depends(get_db)):
-    db_attr = db.query(Attribute).filter(Attribute.id == attribute_id).first()
+async def delete_attribute(attribute_id: int, db: AsyncSession = Depends(get_db)):
+    db_attr = await db.get(Attribute, attribute_id)
     if not db_attr:
         raise HTTPException(status_code=404, detail="Attribute not found")
 
-    db.delete(db_attr)
-    db.commit()
-
-    meili_service.delete_attributes([attribute_id])
+    product_id = db_attr.product_id
+    await db.delete(db_attr)
+    await adjust_facets(db, {(db_attr.name, db_attr.value): -1})
+    await index_outbox.delete(db, ATTRIBUTE_INDEX, [attribute_id])
+    await queue_product_reindex(db, product_id)
+    await db.commit()
+    index_outbox.notify()
+    await entity_cache.invalidate(
+        entity_cache.key("attributes", attribute_id), entity_cache.key("products", product_id)
+    )
     return None
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List
 
 
 class AttributeCreate(BaseModel):
@@ -12,3 +13,18 @@ class AttributeOut(AttributeCreate):
     class Config:
         from_attributes = True
 
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+
+class Facet(BaseModel):
+    name: str
+    values: List[FacetValue] = []
+
+
+class AttributeBatch(BaseModel):
+    items: List[AttributeOut]
+    missing: List[int] = []
+
@@ -0,0 +1,120 @@
+"""Synthetic catalog generator.
+
+Fills the database behind ``DATABASE_URL`` (or a given engine) with
+``categories`` categories, ``products`` products spread evenly across them,
+and ``attributes`` attributes per product drawn from a small vocabulary, so
+attribute filters have realistic selectivity; the attribute facet counts are
+updated to match. Rows go in with chunked executemany inserts; output is
+deterministic for a given ``seed``.
+
+    DATABASE_URL=sqlite:////tmp/catalog.db python -m bench.catalog --products 100000
+"""
+import argparse
+import random
+from collections import Counter
+import time
+
+ATTRIBUTE_VALUES = {
+    "color": ["red", "green", "blue", "black", "white", "silver", "yellow", "orange"],
+    "size": ["xs", "s", "m", "l", "xl", "xxl"],
+    "material": ["steel", "aluminium", "plastic", "wood", "cotton", "glass"],
+    "brand": [f"brand-{i}" for i in range(50)],
+    "weight": [f"{w}g" for w in range(100, 5000, 100)],
+    "warranty": ["none", "1y", "2y", "3y", "5y"],
+    "origin": ["de", "pl", "cn", "us", "it", "fr", "jp"],
+    "voltage": ["5v", "12v", "24v", "110v", "230v"],
+}
+WORDS = ["pro", "mini", "max", "ultra", "classic", "eco", "smart", "basic", "plus", "lite"]
+
+
+def populate(engine, categories=20, products=10_000, attributes=4, seed=0, chunk_size=5000):
+    """Insert the catalog and return the generated row counts."""
+    from sqlalchemy import func, select
+
+    from categories.model import Category
+    from products.model import Product
+    from attributes.facets import _upsert_statement
+    from attributes.model import Attribute
+
+    rng = random.Random(seed)
+    names = list(ATTRIBUTE_VALUES)
+    attributes = min(attributes, len(names))
+    counts = [0] * categories
+    facets = Counter()
+
+    with engine.begin() as conn:
+        # Append after any existing rows so the generator can grow a catalog
+        start_id = (conn.scalar(select(func.max(Product.id))) or 0) + 1
+        first_category = (conn.scalar(select(func.max(Category.id))) or 0) + 1
+        category_ids = list(range(first_category, first_category + categories))
+        for i in range(products):
+            counts[i % categories] += 1
+        conn.execute(
+            Category.__table__.insert(),
+            [
+                {"id": cid, "name": f"category-{cid}", "description": f"Synthetic category {cid}",
+                 "product_count": counts[n]}
+                for n, cid in enumerate(category_ids)
+            ],
+        )
+
+        for offset in range(0, products, chunk_size):
+            ids = range(start_id + offset, start_id + min(offset + chunk_size, products))
+            conn.execute(
+                Product.__table__.insert(),
+                [
+                    {
+                        "id": pid,
+                        "name": f"{rng.choice(WORDS)} product {pid}",
+                        "description": " ".join(rng.choices(WORDS, k=8)),
+                        "category_id": category_ids[(pid - start_id) % categories],
+                    }
+                    for pid in ids
+                ],
+            )
+            if attributes:
+                rows = [
+                    {"name": name, "value": rng.choice(ATTRIBUTE_VALUES[name]), "product_id": pid}
+                    for pid in ids
+                    for name in rng.sample(names, attributes)
+                ]
+                conn.execute(Attribute.__table__.insert(), rows)
+                facets.update((row["name"], row["value"]) for row in rows)
+
+        # Keep the materialized facet counts in step with the rows just added
+        if facets:
+            conn.execute(
+                _upsert_statement(conn.dialect.name),
+                [{"name": name, "value": value, "delta": n} for (name, value), n in facets.items()],
+            )
+
+    return {
+        "categories": categories,
+        "products": products,
+        "attributes": products * attributes,
+        "first_product_id": start_id,
+        "category_ids": category_ids,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--attributes", type=int, default=4, help="attributes per product")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from db import session as db_session
+    import products.model  # noqa: F401
+    import categories.model  # noqa: F401
+    import attributes.model  # noqa: F401
+    import outbox.model  # noqa: F401
+
+    db_session.Base.metadata.create_all(bind=db_session.engine)
+    t = time.perf_counter()
+    result = populate(db_session.engine, args.categories, args.products, args.attributes, args.seed)
+    print(
+        f"Generated {result['categories']} categories, {result['products']} products and "
+        f"{result['attributes']} attributes in {time.perf_counter() - t:.1f} s"
+    )
@@ -0,0 +1,55 @@
+"""Compare two benchmark result files.
+
+    python -m bench.compare before.json after.json
+
+Prints p50/p95/p99 and throughput per benchmark with the relative change,
+and exits non-zero when any p95 regresses by more than ``--threshold``
+percent.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+
+
+def change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def main(args):
+    before = json.loads(open(args.before).read())
+    after = json.loads(open(args.after).read())
+    print(f"{'benchmark':<28}" + "".join(f"{m:>30}" for m in METRICS))
+    regressions = []
+    for name, result in after["results"].items():
+        baseline = before["results"].get(name)
+        if baseline is None:
+            continue
+        cells = []
+        for metric in METRICS:
+            b, a = baseline.get(metric), result.get(metric)
+            if b is None or a is None:
+                cells.append(f"{'-':>30}")
+                continue
+            delta = change(b, a)
+            # No relative change from a zero baseline
+            pct = "n/a" if delta is None else f"{delta:+.0f}%"
+            cells.append(f"{b:.1f} -> {a:.1f} ({pct})".rjust(30))
+            if metric == "p95_ms" and delta is not None and delta > args.threshold:
+                regressions.append(name)
+        print(f"{name:<28}" + "".join(cells))
+    if regressions:
+        print(f"\np95 regressed by more than {args.threshold:.0f}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95 regression in percent")
+    sys.exit(main(parser.parse_args()))
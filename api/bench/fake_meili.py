@@ -0,0 +1,252 @@
+"""Minimal in-process Meilisearch stand-in for benchmarks.
+
+Implements the routes the API and the official client use (health, index
+create/get/settings, document add/fetch/delete, search) over an in-memory
+store, so load tests measure the API rather than a real search engine.
+Searches do a case-insensitive substring match on ``name`` and support the
+``field = value`` filters the routers generate, plus the numeric id ranges
+the incremental sync fetches. ``latency_ms`` adds a fixed delay to every
+request to model a remote engine; raising it past the API's timeouts with
+:meth:`FakeMeilisearch.set_latency` models an outage.
+"""
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+_FILTER = re.compile(r'^\s*(\w+)\s*(=|>=|<=|>|<)\s*(?:"((?:[^"\\]|\\.)*)"|(\S+))\s*$')
+_COMPARE = {
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+def _matches(doc, filters):
+    """Apply ``field = value`` and numeric ``field > value`` filters."""
+    for expr in filters:
+        match = _FILTER.match(expr)
+        if not match:
+            continue
+        field, op, quoted, bare = match.groups()
+        expected = quoted.replace('\\"', '"').replace("\\\\", "\\") if quoted is not None else bare
+        actual = doc.get(field)
+        if op in _COMPARE:
+            if actual is None or not _COMPARE[op](float(actual), float(expected)):
+                return False
+            continue
+        values = actual if isinstance(actual, list) else [actual]
+        if expected not in {str(v) for v in values}:
+            return False
+    return True
+
+
+class FakeMeiliStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indexes = {}
+        self.settings = {}
+        self.task_uid = 0
+
+    def task(self, index_uid, kind):
+        with self.lock:
+            self.task_uid += 1
+            uid = self.task_uid
+        return {
+            "taskUid": uid,
+            "indexUid": index_uid,
+            "status": "enqueued",
+            "type": kind,
+            "enqueuedAt": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+
+    def index(self, uid, create=False):
+        with self.lock:
+            if uid not in self.indexes and create:
+                self.indexes[uid] = {}
+            return self.indexes.get(uid)
+
+    def search(self, uid, body):
+        docs = self.index(uid) or {}
+        query = (body.get("q") or "").lower()
+        filters = body.get("filter") or []
+        if isinstance(filters, str):
+            filters = [filters]
+        t = time.perf_counter()
+        with self.lock:
+            hits = [
+                d for d in docs.values()
+                if query in str(d.get("name", "")).lower() and _matches(d, filters)
+            ]
+        offset, limit = body.get("offset", 0), body.get("limit", 20)
+        page = hits[offset:offset + limit]
+        fields = body.get("attributesToRetrieve")
+        if fields and fields != ["*"]:
+            page = [{k: v for k, v in d.items() if k in fields} for d in page]
+        displayed = self.settings.get(uid, {}).get("displayedAttributes")
+        if displayed and displayed != ["*"]:
+            page = [{k: v for k, v in d.items() if k in displayed} for d in page]
+        return {
+            "hits": page,
+            "query": body.get("q", ""),
+            "limit": limit,
+            "offset": offset,
+            "estimatedTotalHits": len(hits),
+            "processingTimeMs": int((time.perf_counter() - t) * 1000),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store: FakeMeiliStore = None
+    latency_ms = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self, uid):
+        self._send(404, {
+            "message": f"Index `{uid}` not found.",
+            "code": "index_not_found",
+            "type": "invalid_request",
+            "link": "https://docs.meilisearch.com/errors#index_not_found",
+        })
+
+    def _dispatch(self, method):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        body = self._body() if method in ("POST", "PUT", "PATCH") else None
+        store = self.store
+
+        if parts == ["health"]:
+            return self._send(200, {"status": "available"})
+        if len(parts) == 2 and parts[0] == "tasks":
+            # Every task is applied synchronously, so it has already succeeded
+            task = store.task(None, "unknown")
+            return self._send(200, {**task, "uid": int(parts[1]), "status": "succeeded"})
+        if parts == ["indexes"] and method == "POST":
+            store.index(body["uid"], create=True)
+            return self._send(202, store.task(body["uid"], "indexCreation"))
+        if len(parts) < 2 or parts[0] != "indexes":
+            return self._send(404, {"message": "not found", "code": "not_found", "type": "invalid_request", "link": ""})
+
+        uid, rest = parts[1], parts[2:]
+        if not rest and method == "GET":
+            if store.index(uid) is None:
+                return self._not_found(uid)
+            return self._send(200, {"uid": uid, "primaryKey": "id", "createdAt": None, "updatedAt": None})
+        if rest == ["settings"]:
+            store.index(uid, create=True)
+            store.settings.setdefault(uid, {}).update(body or {})
+            return self._send(202, store.task(uid, "settingsUpdate"))
+        if rest == ["search"]:
+            if store.index(uid) is None:
+                return self._not_found(uid)
+            return self._send(200, store.search(uid, body or {}))
+        if rest[:1] == ["documents"]:
+            docs = store.index(uid, create=True)
+            if rest == ["documents"] and method in ("POST", "PUT"):
+                with store.lock:
+                    # Keyed by the id as a string: the client sends ids to delete-batch as strings
+                    for doc in body or []:
+                        docs[str(doc["id"])] = doc
+                return self._send(202, store.task(uid, "documentAdditionOrUpdate"))
+            if rest == ["documents"] and method == "DELETE":
+                with store.lock:
+                    docs.clear()
+                return self._send(202, store.task(uid, "documentDeletion"))
+            if rest == ["documents", "delete-batch"]:
+                with store.lock:
+                    for doc_id in body or []:
+                        docs.pop(str(doc_id), None)
+                return self._send(202, store.task(uid, "documentDeletion"))
+            if rest == ["documents", "fetch"]:
+                params = body or {}
+                offset, limit = params.get("offset", 0), params.get("limit", 20)
+                fields = params.get("fields")
+                # Only the sync's "id > a AND id <= b" ranges are sent here
+                filters = params["filter"].split(" AND ") if params.get("filter") else []
+                with store.lock:
+                    matching = [d for d in docs.values() if _matches(d, filters)]
+                page = matching[offset:offset + limit]
+                total = len(matching)
+                if fields:
+                    page = [{k: v for k, v in d.items() if k in fields} for d in page]
+                return self._send(200, {"results": page, "offset": offset, "limit": limit, "total": total})
+        return self._send(404, {"message": "not found", "code": "not_found", "type": "invalid_request", "link": ""})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under concurrent load
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out hang up before the delayed response is written
+        pass
+
+
+class FakeMeilisearch:
+    """Serve a :class:`FakeMeiliStore` over HTTP from a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0):
+        self.store = FakeMeiliStore()
+        handler = type("Handler", (_Handler,), {"store": self.store, "latency_ms": latency_ms})
+        self.server = _Server((host, port), handler)
+        self._handler = handler
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_latency(self, latency_ms: float):
+        self._handler.latency_ms = latency_ms
+
+    def start(self) -> "FakeMeilisearch":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-meili", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
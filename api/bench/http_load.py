@@ -0,0 +1,194 @@
+"""Concurrent HTTP load test for the API.
+
+Starts the app under uvicorn against a throwaway SQLite file and the
+in-process Meilisearch stand-in (``bench.fake_meili``), seeds a small catalog
+through the bulk import endpoint, then drives a mix of list, get and search
+traffic at a fixed concurrency and prints throughput and latency percentiles
+as JSON.
+
+    python -m bench.http_load --concurrency 100 --requests 5000
+
+``--app-dir`` points the server at another checkout's ``api/`` directory, so
+two revisions (e.g. the sync and async handler stacks) can be compared on the
+same machine:
+
+    git worktree add /tmp/rapidstock-old HEAD~1
+    python -m bench.http_load --app-dir /tmp/rapidstock-old/api
+
+``--outage`` finishes with a search scenario run while the stand-in delays
+every request by 30 s, to check that searches fail fast once the Meilisearch
+circuit breaker opens instead of each one waiting out its timeout.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.fake_meili import FakeMeilisearch  # noqa: E402
+from bench.stats import API_DIR, metadata, summarize, write_results  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app_dir: Path, port: int, db_path: Path, meili_url: str, workers: int = 1):
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{db_path.as_posix()}"
+    env["MEILI_URL"] = meili_url
+    # Keep leader election separate from any other server running on this host
+    env["RUN_DIR"] = str(db_path.parent / "run")
+    cmd = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(cmd, cwd=app_dir, env=env)
+
+
+async def wait_ready(client, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API did not become ready")
+
+
+async def seed(client, products, attributes_per_product):
+    category = (await client.post("/categories/", json={"name": "Bench"})).json()
+    rows = [
+        {
+            "name": f"product-{i}",
+            "description": "benchmark product",
+            "category_id": category["id"],
+            "attributes": [
+                {"name": f"attr-{j}", "value": str(i % 7)} for j in range(attributes_per_product)
+            ],
+        }
+        for i in range(products)
+    ]
+    response = await client.post("/products/bulk", json=rows, timeout=120)
+    if response.status_code == 404 or response.status_code == 405:
+        # Older revisions without bulk import: fall back to one request per product
+        ids = [(await client.post("/products/", json=row)).json()["id"] for row in rows]
+    else:
+        ids = response.json()["ids"]
+    return ids
+
+
+async def run_load(client, paths, total, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(paths[i % len(paths)])
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - t) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+SCENARIOS = {
+    "get_product": lambda ids: [f"/products/{pid}" for pid in ids[:200]],
+    "list_products": lambda ids: [f"/products/?limit=50&cursor={pid}" for pid in ids[:200:10]],
+    "search_products": lambda ids: [f"/products/search?q=product-{i}" for i in range(20)],
+    "batch_products": lambda ids: [
+        "/products/batch?ids=" + ",".join(str(pid) for pid in ids[i:i + 50]) for i in range(0, 200, 50)
+    ],
+}
+
+
+async def main(args):
+    app_dir = Path(args.app_dir).resolve() if args.app_dir else API_DIR
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, FakeMeilisearch(latency_ms=args.meili_latency_ms) as fake:
+        port = free_port()
+        server = start_server(app_dir, port, Path(tmp) / "bench.db", fake.url, args.workers)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        try:
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60
+            ) as client:
+                await wait_ready(client)
+                ids = await seed(client, args.products, args.attributes)
+                # Let the outbox push the seeded documents so searches have hits
+                await asyncio.sleep(2)
+                mixed = []
+                for name, make_paths in SCENARIOS.items():
+                    paths = make_paths(ids)
+                    mixed.extend(paths)
+                    # Warm up connections and caches before measuring
+                    await run_load(client, paths, min(200, args.requests), args.concurrency)
+                    results[name] = await run_load(client, paths, args.requests, args.concurrency)
+                results["mixed"] = await run_load(client, mixed, args.requests, args.concurrency)
+                if args.outage:
+                    fake.set_latency(30_000)
+                    results["search_outage"] = await run_load(
+                        client, SCENARIOS["search_products"](ids), args.requests, args.concurrency
+                    )
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+    return {
+        "meta": metadata(
+            app_dir,
+            benchmark="http_load",
+            app_dir=str(app_dir),
+            concurrency=args.concurrency,
+            requests=args.requests,
+            workers=args.workers,
+            products=args.products,
+            meili_latency_ms=args.meili_latency_ms,
+            outage=args.outage,
+        ),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app-dir", help="api/ directory of the revision to benchmark")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=5000, help="requests per scenario")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--attributes", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--meili-latency-ms", type=float, default=2.0,
+                        help="delay added by the Meilisearch stand-in to every request")
+    parser.add_argument("--outage", action="store_true",
+                        help="also measure searches while Meilisearch is unresponsive")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args()
+    write_results(args.output, asyncio.run(main(args)))
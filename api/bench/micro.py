@@ -0,0 +1,169 @@
+"""Microbenchmarks for the sync path and the product endpoints.
+
+Generates a synthetic catalog in a throwaway SQLite database, points the
+search service at the in-process Meilisearch stand-in, and times:
+
+- ``sync_all_data``, full and incremental (nothing changed);
+- ``GET /products/`` pages and ``GET /products/{id}`` in-process via ASGI;
+- ``POST /products/`` and ``PUT /products/{id}``.
+
+The entity cache is disabled unless ``--cache`` is given, so reads measure
+the database path. Results are written as JSON for comparison across
+revisions (see ``bench.compare``):
+
+    python -m bench.micro --products 20000 --output micro.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.fake_meili import FakeMeilisearch  # noqa: E402
+from bench.stats import metadata, summarize, write_results  # noqa: E402
+
+
+def time_sync(runs, fn):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - t) * 1000)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def time_requests(client, iterations, make_request):
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        response = await make_request(client, i)
+        latencies.append((time.perf_counter() - t) * 1000)
+        errors += response.status_code >= 400
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def endpoint_benchmarks(app, catalog, iterations, rng):
+    import httpx
+
+    first = catalog["first_product_id"]
+    product_ids = range(first, first + catalog["products"])
+    category_ids = catalog["category_ids"]
+    created = []
+
+    async def list_page(client, i):
+        cursor = rng.choice(product_ids)
+        return await client.get(f"/products/?limit=100&cursor={cursor}")
+
+    async def get_one(client, i):
+        return await client.get(f"/products/{rng.choice(product_ids)}")
+
+    async def create(client, i):
+        response = await client.post("/products/", json={
+            "name": f"bench product {i}",
+            "description": "created by bench.micro",
+            "category_id": rng.choice(category_ids),
+            "attributes": [{"name": "color", "value": "red"}, {"name": "size", "value": "m"}],
+        })
+        created.append(response.json()["id"])
+        return response
+
+    async def update(client, i):
+        return await client.put(f"/products/{created[i % len(created)]}", json={
+            "name": f"bench product {i}",
+            "description": "updated by bench.micro",
+            "category_id": rng.choice(category_ids),
+            "attributes": [{"name": "color", "value": rng.choice(["red", "blue"])}, {"name": "size", "value": "m"}],
+        })
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm-up: connection pools, mapper configuration, statement caches
+        for i in range(20):
+            await list_page(client, i)
+            await get_one(client, i)
+        return {
+            "list_products": await time_requests(client, iterations, list_page),
+            "get_product": await time_requests(client, iterations, get_one),
+            "create_product": await time_requests(client, iterations, create),
+            "update_product": await time_requests(client, iterations, update),
+        }
+
+
+def main(args):
+    tmp = tempfile.TemporaryDirectory()
+    fake = FakeMeilisearch(latency_ms=args.meili_latency_ms).start()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}/bench.db"
+    os.environ["MEILI_URL"] = fake.url
+    if not args.cache:
+        os.environ["CACHE_MAX_ENTRIES"] = "0"
+
+    import logging
+
+    logging.getLogger("meili_sync").setLevel(logging.WARNING)
+
+    import main as app_module
+    from bench.catalog import populate
+    from db import session as db_session
+    from db.schema import setup_schema
+    from services.meili import meili_service
+
+    # The app only sets up its schema in the lifespan, which these in-process calls skip
+    setup_schema(db_session.engine, db_session.Base.metadata)
+    t = time.perf_counter()
+    catalog = populate(db_session.engine, args.categories, args.products, args.attributes, args.seed)
+    generate_ms = (time.perf_counter() - t) * 1000
+    meili_service.ensure_indexes_exist()
+
+    def sync(full):
+        db = db_session.SessionLocal()
+        try:
+            meili_service.sync_all_data(db, full=full)
+        finally:
+            db.close()
+
+    results = {
+        "generate_catalog": {"ms": round(generate_ms, 1)},
+        "sync_all_data_full": time_sync(args.sync_runs, lambda: sync(True)),
+        "sync_all_data_incremental": time_sync(args.sync_runs, lambda: sync(False)),
+    }
+    results.update(
+        asyncio.run(endpoint_benchmarks(app_module.app, catalog, args.iterations, random.Random(args.seed)))
+    )
+    fake.stop()
+    db_session.engine.dispose()
+    tmp.cleanup()
+    return {
+        "meta": metadata(
+            benchmark="micro",
+            categories=args.categories,
+            products=args.products,
+            attributes=args.attributes,
+            iterations=args.iterations,
+            cache=args.cache,
+            meili_latency_ms=args.meili_latency_ms,
+        ),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--attributes", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=500, help="requests per endpoint benchmark")
+    parser.add_argument("--sync-runs", type=int, default=3)
+    parser.add_argument("--meili-latency-ms", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="keep the entity cache enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args()
+    write_results(args.output, main(args))
@@ -0,0 +1,98 @@
+"""Per-endpoint SQL statement budgets.
+
+Seeds a small catalog in a throwaway SQLite database, calls each endpoint
+in-process and fails if it runs more statements than its budget. Budgets do
+not grow with the page size, so a per-row lazy load (an N+1) on any list or
+write path shows up as a failure:
+
+    python -m bench.query_budgets
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.fake_meili import FakeMeilisearch  # noqa: E402
+
+PRODUCT = {
+    "name": "budget product",
+    "category_id": 1,
+    "attributes": [{"name": "color", "value": "red"}, {"name": "size", "value": "m"}],
+}
+
+# (method, path, json body, max statements)
+BUDGETS = [
+    ("GET", "/products/?limit=100", None, 2),
+    ("GET", "/products/?limit=100&fields=name,category_id", None, 1),
+    ("GET", "/products/1", None, 2),
+    ("GET", "/products/export", None, 2),
+    ("GET", "/products/batch?ids=" + ",".join(str(i) for i in range(200, 0, -1)), None, 2),
+    ("GET", "/categories/?limit=100", None, 1),
+    ("GET", "/categories/counts", None, 1),
+    ("GET", "/categories/1", None, 1),
+    ("GET", "/attributes/?limit=100", None, 1),
+    ("GET", "/attributes/1", None, 1),
+    ("GET", "/attributes/facets?limit=10", None, 1),
+    ("GET", "/products/filter?attribute=color:red&attribute=color:blue&attribute=size:m&limit=100", None, 2),
+    ("GET", "/categories/batch?ids=3,1,2,999", None, 1),
+    ("GET", "/attributes/batch?ids=" + ",".join(str(i) for i in range(1, 201)), None, 1),
+    # SQLite has no ordered multi-row RETURNING, so the unit of work inserts
+    # attributes one statement per row; PRODUCT has two
+    ("POST", "/products/", PRODUCT, 8),
+    ("PUT", "/products/1", {**PRODUCT, "attributes": [{"name": "color", "value": "blue"}]}, 10),
+    # Ids are assigned up front, so a bulk chunk costs the same whatever its size
+    ("POST", "/products/bulk", [{**PRODUCT, "name": f"bulk {i}"} for i in range(200)], 9),
+    # Reindexes the category's products one keyset page at a time
+    ("PUT", "/categories/1", {"name": "renamed"}, 7),
+    ("DELETE", "/products/2", None, 8),
+]
+
+
+async def run(app):
+    import httpx
+    from services.profiling import query_budget, QueryBudgetExceeded
+
+    failures = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for method, path, body, budget in BUDGETS:
+            try:
+                with query_budget(budget) as log:
+                    response = await client.request(method, path, json=body)
+                    # Streaming responses run their queries while the body is read
+                    await response.aread()
+                status = "ok" if response.status_code < 400 else f"HTTP {response.status_code}"
+                failures += response.status_code >= 400
+            except QueryBudgetExceeded as e:
+                status, failures = "FAIL", failures + 1
+                print(f"[FAIL] {method} {path[:60]}: {e}")
+                continue
+            print(f"[{status}] {method} {path[:60]}: {log.count}/{budget} statements")
+    return failures
+
+
+def main():
+    tmp = tempfile.TemporaryDirectory()
+    fake = FakeMeilisearch().start()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}/budgets.db"
+    os.environ["MEILI_URL"] = fake.url
+    os.environ["CACHE_MAX_ENTRIES"] = "0"
+
+    import main as app_module
+    from bench.catalog import populate
+    from db import session as db_session
+    from db.schema import setup_schema
+
+    # The app only sets up its schema in the lifespan, which these in-process calls skip
+    setup_schema(db_session.engine, db_session.Base.metadata)
+    populate(db_session.engine, categories=5, products=500, attributes=4)
+    failures = asyncio.run(run(app_module.app))
+    fake.stop()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
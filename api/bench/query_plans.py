@@ -0,0 +1,113 @@
+"""EXPLAIN QUERY PLAN checks for the hot lookup queries.
+
+Builds a throwaway SQLite database from the models and asserts that each
+query below is answered from an index rather than a full table scan. Exits
+non-zero when any plan regresses, so it can run in CI:
+
+    python -m bench.query_plans
+"""
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp.name}/plans.db"
+
+from sqlalchemy import delete, func, select  # noqa: E402
+
+from db import session as db_session  # noqa: E402
+from products.model import Product  # noqa: E402
+from categories.model import Category  # noqa: E402
+from attributes.model import Attribute  # noqa: E402
+import outbox.model  # noqa: E402,F401
+from products.filters import matching_product_ids  # noqa: E402
+
+# (description, statement, index expected in the plan)
+CHECKS = [
+    (
+        "attribute ids of a product (delete_product)",
+        select(Attribute.id).where(Attribute.product_id == 1),
+        "ix_attributes_product_id",
+    ),
+    (
+        "attribute cleanup on product delete",
+        delete(Attribute).where(Attribute.product_id == 1),
+        "ix_attributes_product_id",
+    ),
+    (
+        "attributes of a page of products (selectinload)",
+        select(Attribute).where(Attribute.product_id.in_([1, 2, 3])),
+        "ix_attributes_product_id",
+    ),
+    (
+        "products of a category, keyset order (category rename)",
+        select(Product)
+        .where(Product.category_id == 1, Product.id > 0)
+        .order_by(Product.id)
+        .limit(1000),
+        "ix_products_category_id",
+    ),
+    (
+        "product count of a category",
+        select(func.count()).select_from(Product).where(Product.category_id == 1),
+        "ix_products_category_id",
+    ),
+    (
+        "attribute lookup by name and value",
+        select(Attribute.product_id).where(Attribute.name == "color", Attribute.value == "red"),
+        "ix_attributes_name_value_product",
+    ),
+    (
+        "attribute lookup by name",
+        select(Attribute).where(Attribute.name == "color"),
+        "ix_attributes_name_value_product",
+    ),
+    (
+        "products matching attribute filters (GET /products/filter)",
+        matching_product_ids({"color": ["1", "2"], "size": ["3"]}, after=100),
+        "COVERING INDEX ix_attributes_name_value_product",
+    ),
+]
+
+
+def explain(conn, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def seed(conn):
+    conn.execute(Category.__table__.insert(), [{"id": i, "name": f"c{i}"} for i in range(1, 21)])
+    conn.execute(
+        Product.__table__.insert(),
+        [{"id": i, "name": f"p{i}", "category_id": i % 20 + 1} for i in range(1, 2001)],
+    )
+    conn.execute(
+        Attribute.__table__.insert(),
+        [
+            {"name": name, "value": str(i % 13), "product_id": i}
+            for i in range(1, 2001)
+            for name in ("color", "size", "brand")
+        ],
+    )
+    # Give the planner real statistics, as a long-running database would have
+    conn.exec_driver_sql("ANALYZE")
+
+
+def main():
+    db_session.Base.metadata.create_all(bind=db_session.engine)
+    failures = 0
+    with db_session.engine.begin() as conn:
+        seed(conn)
+        for description, stmt, index in CHECKS:
+            plan = explain(conn, stmt)
+            ok = any(index in step for step in plan)
+            failures += not ok
+            print(f"[{'ok' if ok else 'FAIL'}] {description}")
+            for step in plan:
+                print(f"       {step}")
+    db_session.engine.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Product list serialization: response_model path vs Core rows and orjson.
+
+Times a ``GET /products/`` page of 1k and 10k rows (with attributes) built
+two ways, in-process and without HTTP so pages larger than MAX_PAGE_SIZE can
+be measured:
+
+- ``pydantic``: ORM rows with selectinload, validated and dumped through the
+  route's ``response_model`` by FastAPI's ``serialize_response`` and encoded
+  by ``JSONResponse``, as with ``FAST_SERIALIZATION=false``;
+- ``rows``: a Core select into dicts plus one attribute query, encoded by
+  ``FastJSONResponse``, as with the default ``FAST_SERIALIZATION=true``.
+
+Each result covers the whole page (SQL, building, encoding); the ``_encode``
+entries time only the serialization step. Both bodies are compared byte for
+byte once before timing, so the two paths must produce the same JSON, down
+to key order and spacing.
+
+    python -m bench.serialization --rows 1000 10000 --output serialization.json
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.stats import metadata, summarize, write_results  # noqa: E402
+
+
+async def time_page(runs, fetch, encode):
+    """Run ``encode(await fetch())`` ``runs`` times; returns (total, encode-only) summaries and the body."""
+    totals, encodes = [], []
+    started = time.perf_counter()
+    for _ in range(runs):
+        t = time.perf_counter()
+        page = await fetch()
+        e = time.perf_counter()
+        body = await encode(page)
+        done = time.perf_counter()
+        totals.append((done - t) * 1000)
+        encodes.append((done - e) * 1000)
+    elapsed = time.perf_counter() - started
+    return summarize(totals, elapsed), summarize(encodes, elapsed), body
+
+
+async def run(app, db_session, sizes, runs):
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from products.model import Product
+    from products.router import attach_attributes
+    from products.schemas import ProductOut
+    from shared.pagination import keyset_page, keyset_rows, schema_columns
+    from shared.responses import FastJSONResponse
+
+    route = next(r for r in app.routes if getattr(r, "path", None) == "/products/" and "GET" in r.methods)
+    results = {}
+    for n in sizes:
+        async def fetch_orm():
+            # A fresh session per page, as per request, so the identity map starts empty
+            async with db_session.AsyncReadSessionLocal() as db:
+                stmt = select(Product).options(selectinload(Product.attributes))
+                items, _ = await keyset_page(db, stmt, Product.id, None, n)
+                return items
+
+        async def encode_orm(items):
+            content = await serialize_response(field=route.response_field, response_content=items)
+            return JSONResponse(content).body
+
+        async def fetch_rows():
+            async with db_session.AsyncReadSessionLocal() as db:
+                stmt = select(*schema_columns(Product, ProductOut, None))
+                rows, _ = await keyset_rows(db, stmt, Product.id, None, n)
+                await attach_attributes(db, rows)
+                return rows
+
+        async def encode_rows(rows):
+            return FastJSONResponse(rows).body
+
+        # Warm up, and check both paths agree
+        expected = await encode_orm(await fetch_orm())
+        actual = await encode_rows(await fetch_rows())
+        if expected != actual:
+            raise SystemExit(f"Serialization paths disagree at {n} rows")
+
+        for name, fetch, encode in (("pydantic", fetch_orm, encode_orm), ("rows", fetch_rows, encode_rows)):
+            total, encode_only, body = await time_page(runs, fetch, encode)
+            total["body_bytes"] = len(body)
+            results[f"{name}_{n}_rows"] = total
+            results[f"{name}_{n}_rows_encode"] = encode_only
+    return results
+
+
+def main(args):
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}/bench.db"
+
+    import logging
+
+    logging.getLogger("meili_sync").setLevel(logging.WARNING)
+
+    import main as app_module
+    from bench.catalog import populate
+    from db import session as db_session
+    from db.schema import setup_schema
+
+    setup_schema(db_session.engine, db_session.Base.metadata)
+    populate(db_session.engine, args.categories, max(args.rows), args.attributes, args.seed)
+
+    async def go():
+        try:
+            return await run(app_module.app, db_session, args.rows, args.runs)
+        finally:
+            await db_session.async_engine.dispose()
+            await db_session.async_read_engine.dispose()
+
+    results = asyncio.run(go())
+    db_session.engine.dispose()
+    tmp.cleanup()
+    return {
+        "meta": metadata(
+            benchmark="serialization",
+            rows=args.rows,
+            attributes=args.attributes,
+            runs=args.runs,
+        ),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10_000], help="page sizes to measure")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--attributes", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=20, help="pages built per path and size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args()
+    write_results(args.output, main(args))
@@ -0,0 +1,109 @@
+"""Cold-start cost of the API process.
+
+Measures two things, each over ``--runs`` fresh processes:
+
+* ``import_main``: ``python -X importtime -c "import main"``, the cost every
+  worker pays before it can do anything. The slowest modules of the last run
+  are listed under ``slowest_imports`` (self time, so parents are not
+  double-counted).
+* ``first_request``: from spawning uvicorn to the first successful
+  ``GET /``, against an empty SQLite database each time, so it includes
+  schema setup in the lifespan.
+
+    python -m bench.startup --runs 10
+    python -m bench.startup --app-dir /tmp/rapidstock-old/api
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.fake_meili import FakeMeilisearch  # noqa: E402
+from bench.http_load import free_port, start_server  # noqa: E402
+from bench.stats import API_DIR, metadata, summarize, write_results  # noqa: E402
+
+
+def parse_importtime(stderr: str):
+    """Return ``(total_us, [(self_us, module), ...])`` from ``-X importtime`` output."""
+    modules = []
+    total = None
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # header line
+        modules.append((int(self_us), name.strip()))
+        if name.strip() == "main":
+            total = int(cumulative_us)
+    return total, modules
+
+
+def measure_import(app_dir: Path, env: dict):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=app_dir, env=env, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure_first_request(app_dir: Path, tmp: Path, meili_url: str, timeout: float = 60.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = start_server(app_dir, port, tmp / "startup.db", meili_url)
+    try:
+        deadline = time.monotonic() + timeout
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while time.monotonic() < deadline:
+                try:
+                    if client.get("/").status_code == 200:
+                        return (time.perf_counter() - started) * 1000
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise RuntimeError("API did not become ready")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main(args):
+    app_dir = Path(args.app_dir).resolve() if args.app_dir else API_DIR
+    import_ms, first_request_ms = [], []
+    slowest = []
+    with FakeMeilisearch() as fake:
+        for run in range(args.runs):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ)
+                env["DATABASE_URL"] = f"sqlite:///{Path(tmp).as_posix()}/import.db"
+                env["MEILI_URL"] = fake.url
+                env["RUN_DIR"] = str(Path(tmp) / "run")
+                total_us, modules = measure_import(app_dir, env)
+                import_ms.append(total_us / 1000)
+                slowest = sorted(modules, reverse=True)[:args.top]
+                first_request_ms.append(measure_first_request(app_dir, Path(tmp), fake.url))
+    return {
+        "meta": metadata(app_dir, benchmark="startup", app_dir=str(app_dir), runs=args.runs),
+        "results": {
+            "import_main": summarize(import_ms, 0),
+            "first_request": summarize(first_request_ms, 0),
+        },
+        "slowest_imports": [{"module": name, "self_ms": round(us / 1000, 2)} for us, name in slowest],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app-dir", help="api/ directory of the revision to benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to list")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args()
+    write_results(args.output, main(args))
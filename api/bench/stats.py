@@ -0,0 +1,61 @@
+# Latency summaries and result files shared by the benchmarks
+import json
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies_ms, elapsed_s, errors=0):
+    """Throughput and latency percentiles for one benchmark."""
+    if not latencies_ms:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "throughput_rps": round(len(latencies_ms) / elapsed_s, 1) if elapsed_s else None,
+        "mean_ms": round(statistics.fmean(latencies_ms), 3),
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "max_ms": round(max(latencies_ms), 3),
+    }
+
+
+def git_revision(app_dir: Path = API_DIR):
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=app_dir, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(source_dir: Path = API_DIR, **params):
+    return {
+        "revision": git_revision(source_dir),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+    }
+
+
+def write_results(path, results):
+    text = json.dumps(results, indent=2)
+    print(text)
+    if path:
+        Path(path).write_text(text + "\n")
@@ -0,0 +1,31 @@
+# Materialized products-per-category counters, maintained by the product write paths
+from typing import Mapping
+
+from sqlalchemy import bindparam, update
+
+from categories.model import Category
+
+_categories = Category.__table__
+
+# Core statement so a whole chunk of deltas runs as one executemany
+_adjust = (
+    update(_categories)
+    .where(_categories.c.id == bindparam("category_id"))
+    .values(product_count=_categories.c.product_count + bindparam("delta"))
+)
+
+
+async def adjust_product_counts(db, deltas: Mapping[int, int]):
+    """Add ``deltas[category_id]`` to each category's product_count in the caller's transaction.
+
+    Increments happen in SQL, so concurrent writers cannot lose updates.
+    """
+    rows = [
+        {"category_id": category_id, "delta": delta}
+        for category_id, delta in deltas.items()
+        if category_id is not None and delta
+    ]
+    if rows:
+        await db.execute(_adjust, rows)
+    return [row["category_id"] for row in rows]
+
@@ -8,5 +8,7 @@ class Category(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     description = Column(Text)
-    products = relationship("Product", backref="category")
+    # Maintained by the product write paths (categories/counts.py)
+    product_count = Column(Integer, nullable=False, default=0, server_default="0")
+    products = relationship("Product", back_populates="category")
 
@@ -1,83 +1,181 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from core.dependencies import get_db
+from core.dependencies import get_db, get_read_db
 from categories.model import Category
-from categories.schemas import CategoryCreate, CategoryOut
+from categories.schemas import CategoryCreate, CategoryOut, CategoryBatch, CategoryCounts
+from core.config import CATEGORY_INDEX, PRODUCT_INDEX, MEILI_SYNC_BATCH_SIZE, FAST_SERIALIZATION
+from services.indexing import index_outbox
 from services.meili import meili_service
+from services.cache import entity_cache
+from services.documents import category_document, product_document, product_select
+from shared.schemas import SearchPage
+from shared.pagination import (
+    keyset_page,
+    keyset_rows,
+    page_response,
+    parse_fields,
+    rows_response,
+    schema_columns,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+)
+from shared.export import export_response, EXPORT_CHUNK_SIZE, EXPORT_FORMAT_PATTERN
+from shared.cache import cached_entity
+from shared.batch import IDS_QUERY, parse_ids, load_by_ids
+from shared.search import search_page, MAX_SEARCH_LIMIT
 from products.model import Product
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 
 @router.post("/", response_model=CategoryOut)
-def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(category: CategoryCreate, db: AsyncSession = Depends(get_db)):
     db_category = Category(name=category.name, description=category.description)
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.flush()  # get id for the outbox row
 
-    # Index in Meilisearch
-    category_data = {
-        "id": db_category.id,
-        "name": db_category.name,
-        "description": db_category.description,
-    }
-    meili_service.add_category(category_data)
+    # Record Meilisearch change in the outbox, same transaction
+    await index_outbox.upsert(db, CATEGORY_INDEX, [category_document(db_category)])
+    await db.commit()
+    index_outbox.notify()
 
     return db_category
 
 
 @router.get("/", response_model=List[CategoryOut])
-def list_categories(db: Session = Depends(get_db)):
-    return db.query(Category).all()
+async def list_categories(
+        request: Request,
+        response: Response,
+        cursor: Optional[int] = Query(None, description="Return items with id greater than this"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+        db: AsyncSession = Depends(get_read_db),
+):
+    selected = parse_fields(fields, CategoryOut)
+    if FAST_SERIALIZATION:
+        stmt = select(*schema_columns(Category, CategoryOut, selected))
+        rows, next_cursor = await keyset_rows(db, stmt, Category.id, cursor, limit)
+        return rows_response(request, rows, next_cursor)
+    items, next_cursor = await keyset_page(db, select(Category), Category.id, cursor, limit)
+    return page_response(request, response, items, next_cursor, CategoryOut, selected)
+
+
+@router.get("/counts", response_model=CategoryCounts)
+async def category_counts(db: AsyncSession = Depends(get_read_db)):
+    # Reads the materialized counters: one row per category, no scan of products
+    rows = (
+        await db.execute(select(Category.id, Category.name, Category.product_count).order_by(Category.id))
+    ).all()
+    return CategoryCounts(
+        total_products=sum(r.product_count for r in rows),
+        categories=rows,
+    )
+
+
+@router.get("/search", response_model=SearchPage)
+async def search_categories(
+        q: str = "",
+        limit: int = Query(20, ge=1, le=MAX_SEARCH_LIMIT),
+        offset: int = Query(0, ge=0),
+        attributes_to_retrieve: Optional[List[str]] = Query(None, alias="attributesToRetrieve"),
+        category_id: Optional[int] = None,
+):
+    filters = [f"id = {category_id}"] if category_id is not None else []
+    return await search_page(
+        meili_service.search_categories,
+        q,
+        limit=limit,
+        offset=offset,
+        attributes_to_retrieve=attributes_to_retrieve,
+        filters=filters,
+    )
+
+
+@router.get("/export")
+async def export_categories(
+        fmt: str = Query("ndjson", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+):
+    async def rows(db: AsyncSession):
+        stmt = select(Category).order_by(Category.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        async for c in await db.stream_scalars(stmt):
+            yield {"id": c.id, "name": c.name, "description": c.description, "product_count": c.product_count}
+
+    return export_response(rows, fmt, ["id", "name", "description", "product_count"], "categories")
+
+
+@router.get("/batch", response_model=CategoryBatch)
+async def get_categories_batch(ids: str = IDS_QUERY, db: AsyncSession = Depends(get_read_db)):
+    items, missing = await load_by_ids(db, select(Category), Category.id, parse_ids(ids))
+    return CategoryBatch(items=items, missing=missing)
 
 
 @router.get("/{category_id}", response_model=CategoryOut)
-def get_category(category_id: int, db: Session = Depends(get_db)):
-    cat = db.query(Category).filter(Category.id == category_id).first()
-    if not cat:
-        raise HTTPException(status_code=404, detail="Category not found")
-    return cat
+async def get_category(category_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    # Misses fill the cache from the primary, since a lagging replica's row (and ETag)
+    # would be served until CACHE_TTL; the session only connects on a miss
+    return await cached_entity(
+        request,
+        "categories",
+        category_id,
+        lambda: db.get(Category, category_id),
+        CategoryOut,
+        "Category not found",
+    )
 
 
 @router.put("/{category_id}", response_model=CategoryOut)
-def update_category(category_id: int, category: CategoryCreate, db: Session = Depends(get_db)):
-    db_cat = db.query(Category).filter(Category.id == category_id).first()
+async def update_category(category_id: int, category: CategoryCreate, db: AsyncSession = Depends(get_db)):
+    db_cat = await db.get(Category, category_id)
     if not db_cat:
         raise HTTPException(status_code=404, detail="Category not found")
 
+    renamed = db_cat.name != category.name
     db_cat.name = category.name
     db_cat.description = category.description
-    db.commit()
-    db.refresh(db_cat)
 
-    meili_service.add_category({
-        "id": db_cat.id,
-        "name": db_cat.name,
-        "description": db_cat.description,
-    })
+    await index_outbox.upsert(db, CATEGORY_INDEX, [category_document(db_cat)])
+    if renamed:
+        # Product documents embed the category name; refresh them in the same transaction
+        last_id = 0
+        while True:
+            products = (
+                await db.scalars(
+                    product_select()
+                    .where(Product.category_id == category_id, Product.id > last_id)
+                    .order_by(Product.id)
+                    .limit(MEILI_SYNC_BATCH_SIZE)
+                )
+            ).all()
+            if not products:
+                break
+            await index_outbox.upsert(db, PRODUCT_INDEX, [product_document(p, db_cat) for p in products])
+            last_id = products[-1].id
+    await db.commit()
+    index_outbox.notify()
+    await entity_cache.invalidate(entity_cache.key("categories", category_id))
 
     return db_cat
 
 
 @router.delete("/{category_id}", status_code=204)
-def delete_category(category_id: int, db: Session = Depends(get_db)):
-    db_cat = db.query(Category).filter(Category.id == category_id).first()
+async def delete_category(category_id: int, db: AsyncSession = Depends(get_db)):
+    db_cat = await db.get(Category, category_id)
     if not db_cat:
         raise HTTPException(status_code=404, detail="Category not found")
 
     # Prevent deletion if products exist in this category to avoid FK errors
-    product_count = db.query(Product).filter(Product.category_id == category_id).count()
-    if product_count > 0:
+    if db_cat.product_count > 0:
         raise HTTPException(
             status_code=400,
-            detail=f"Cannot delete category {category_id}: {product_count} products still reference it",
+            detail=f"Cannot delete category {category_id}: {db_cat.product_count} products still reference it",
         )
 
-    db.delete(db_cat)
-    db.commit()
-
-    meili_service.delete_category(category_id)
+    await db.delete(db_cat)
+    await index_outbox.delete(db, CATEGORY_INDEX, [category_id])
+    await db.commit()
+    index_outbox.notify()
+    await entity_cache.invalidate(entity_cache.key("categories", category_id))
     return None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 class CategoryCreate(BaseModel):
@@ -9,7 +9,26 @@ class CategoryCreate(BaseModel):
 
 class CategoryOut(CategoryCreate):
     id: int
+    product_count: int = 0
 
     class Config:
         from_attributes = True
 
+
+class CategoryBatch(BaseModel):
+    items: List[CategoryOut]
+    missing: List[int] = []
+
+
+class CategoryCount(BaseModel):
+    id: int
+    name: str
+    product_count: int
+
+    class Config:
+        from_attributes = True
+
+
+class CategoryCounts(BaseModel):
+    total_products: int
+    categories: List[CategoryCount] = []
@@ -3,12 +3,56 @@ from pathlib import Path
 
 # Base directories
 API_DIR = Path(__file__).resolve().parent.parent  # api/
+# Created on first connect (db.session), not when this module is imported
 DATA_SQLITE_DIR = API_DIR.parent / "data" / "sqlite"
-DATA_SQLITE_DIR.mkdir(parents=True, exist_ok=True)
 DB_PATH = DATA_SQLITE_DIR / "rapidstock.db"
 
-# Database configuration
-DATABASE_URL = f"sqlite:///{DB_PATH.as_posix()}"
+# Async drivers used by request handlers for each sync URL scheme
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+psycopg_async",
+}
+
+
+def async_url(url: str) -> str:
+    """The async-driver equivalent of a sync database URL."""
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+# Database configuration: any SQLAlchemy URL (sqlite:///..., postgresql://...)
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH.as_posix()}")
+# Request handlers use the async driver; background threads keep the sync one
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_url(DATABASE_URL))
+# Optional read replica for GET routes; defaults to the primary
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", "")
+ASYNC_READ_DATABASE_URL = os.getenv(
+    "ASYNC_READ_DATABASE_URL", async_url(READ_DATABASE_URL) if READ_DATABASE_URL else ""
+)
+
+# SQLite tuning applied to every new connection. SQLITE_CACHE_SIZE follows the
+# PRAGMA convention: negative values are KiB, positive values are pages
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY").upper()
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # milliseconds
+
+# Connection pool sizing, per engine. Connections older than DB_POOL_RECYCLE seconds
+# are replaced, and DB_POOL_PRE_PING checks each one before use (server databases)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Debug SQL profiling: per-request statement counts, N+1 warnings when one statement
+# shape runs N_PLUS_ONE_THRESHOLD times in a request, and a log of statements
+# slower than SLOW_QUERY_MS
+QUERY_PROFILING = os.getenv("QUERY_PROFILING", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
 
 # Meilisearch configuration
 MEILI_URL = os.getenv("MEILI_URL", "http://127.0.0.1:7700")
@@ -16,12 +60,62 @@ MEILI_URL = os.getenv("MEILI_URL", "http://127.0.0.1:7700")
 MEILI_MASTER_KEY = os.getenv("MEILI_MASTER_KEY")
 MEILI_API_KEY = os.getenv("MEILI_API_KEY")
 MEILI_KEY = MEILI_MASTER_KEY or MEILI_API_KEY or ""
+# Timeout (seconds) for the async HTTP client used by request handlers
+MEILI_TIMEOUT = float(os.getenv("MEILI_TIMEOUT", "5"))
+# Timeout (seconds) for document writes and the startup sync
+MEILI_WRITE_TIMEOUT = float(os.getenv("MEILI_WRITE_TIMEOUT", "10"))
+# A background probe polls Meilisearch's /health every MEILI_HEALTH_INTERVAL seconds;
+# /health reports its cached result
+MEILI_HEALTH_INTERVAL = float(os.getenv("MEILI_HEALTH_INTERVAL", "5"))
+MEILI_HEALTH_TIMEOUT = float(os.getenv("MEILI_HEALTH_TIMEOUT", "1"))
+# Circuit breaker: after MEILI_BREAKER_FAILURES consecutive timeouts, connection errors
+# or 5xx responses, searches fail fast and index writes wait in the outbox until the
+# probe sees Meilisearch again (or a trial call succeeds after MEILI_BREAKER_RESET seconds)
+MEILI_BREAKER_FAILURES = int(os.getenv("MEILI_BREAKER_FAILURES", "5"))
+MEILI_BREAKER_RESET = float(os.getenv("MEILI_BREAKER_RESET", "30"))
 
 # Meilisearch indexes
 PRODUCT_INDEX = "products"
 CATEGORY_INDEX = "categories"
 ATTRIBUTE_INDEX = "attributes"
 
+# Startup sync: "incremental" pushes only changed/removed documents (compared by
+# content hash), "full" wipes each index and reloads every row
+MEILI_SYNC_MODE = os.getenv("MEILI_SYNC_MODE", "incremental").lower()
+# Rows are streamed from SQLite and pushed in batches of this many documents,
+# with up to MEILI_SYNC_CONCURRENCY batches in flight at once
+MEILI_SYNC_BATCH_SIZE = int(os.getenv("MEILI_SYNC_BATCH_SIZE", "1000"))
+MEILI_SYNC_CONCURRENCY = int(os.getenv("MEILI_SYNC_CONCURRENCY", "2"))
+
+# Write-behind indexing: router mutations are recorded in the search_outbox table
+# and drained every INDEX_FLUSH_INTERVAL seconds (or on commit), INDEX_FLUSH_BATCH_SIZE
+# rows at a time; failed drains back off exponentially up to INDEX_MAX_BACKOFF seconds
+INDEX_FLUSH_INTERVAL = float(os.getenv("INDEX_FLUSH_INTERVAL", "0.5"))
+INDEX_FLUSH_BATCH_SIZE = int(os.getenv("INDEX_FLUSH_BATCH_SIZE", "500"))
+INDEX_MAX_BACKOFF = float(os.getenv("INDEX_MAX_BACKOFF", "30"))
+# A batch Meilisearch rejects outright (4xx) is retried in halves to isolate the bad
+# rows; a single row rejected OUTBOX_MAX_ATTEMPTS times moves to search_outbox_dead_letter
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+
+# Bulk product import commits (and queues index updates) every this many rows
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", "1000"))
+
+# List endpoints read plain rows with Core selects and encode them with orjson, skipping
+# the ORM identity map and response_model validation. Set to false to serialize pages
+# through the Pydantic schemas instead
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "true").lower() in ("1", "true", "yes")
+
+# Read-through cache for single-entity GETs: LRU of CACHE_MAX_ENTRIES responses,
+# each kept for at most CACHE_TTL seconds. Set CACHE_URL (redis://...) to share
+# one cache between workers instead
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+CACHE_URL = os.getenv("CACHE_URL", "")
+
+# Multi-worker startup: lock files and the shared sync-status marker live here, so
+# one worker runs schema setup, the Meilisearch sync and the outbox drainer
+RUN_DIR = Path(os.getenv("RUN_DIR", str(API_DIR.parent / "data" / "run")))
+
 # App configuration
 APP_TITLE = "RapidStock API"
 APP_DESCRIPTION = "FastAPI backend for RapidStock"
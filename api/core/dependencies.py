@@ -1,13 +1,16 @@
-from typing import Generator
+from typing import AsyncGenerator
 import importlib
 
 
-def get_db() -> Generator:
+async def get_db() -> AsyncGenerator:
     # Lazy import to avoid import path issues during tooling/analysis
-    SessionLocal = importlib.import_module("db.session").SessionLocal
-    db = SessionLocal()
-    try:
+    AsyncSessionLocal = importlib.import_module("db.session").AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
+
+async def get_read_db() -> AsyncGenerator:
+    # Read-only routes; served by READ_DATABASE_URL when a replica is configured
+    AsyncReadSessionLocal = importlib.import_module("db.session").AsyncReadSessionLocal
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,17 @@
+# Console output for the API's module loggers (logging.getLogger(__name__))
+import logging
+
+# Top-level packages whose loggers share one handler
+APP_PACKAGES = ("services", "db", "shared")
+
+
+def configure_logging(level: int = logging.INFO):
+    """Print records from the app's modules, tagged with the module name; safe to call twice."""
+    formatter = logging.Formatter("[%(levelname)s] %(asctime)s [%(name)s] %(message)s", "%H:%M:%S")
+    for package in APP_PACKAGES:
+        package_logger = logging.getLogger(package)
+        if not package_logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(formatter)
+            package_logger.addHandler(handler)
+        package_logger.setLevel(level)
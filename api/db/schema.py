@@ -0,0 +1,88 @@
+# In-place upgrades for databases created before a column or index existed.
+# create_all only creates missing tables, so new columns and indexes on existing
+# tables are added here.
+import logging
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+
+def _add_category_product_count(conn):
+    conn.execute(text("ALTER TABLE categories ADD COLUMN product_count INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(
+        text(
+            "UPDATE categories SET product_count = "
+            "(SELECT COUNT(*) FROM products WHERE products.category_id = categories.id)"
+        )
+    )
+
+
+def _backfill_attribute_facets(conn):
+    conn.execute(
+        text(
+            "INSERT INTO attribute_facets (name, value, count) "
+            "SELECT name, value, COUNT(*) FROM attributes GROUP BY name, value"
+        )
+    )
+
+
+# (table, column, upgrade) applied in order when the column is missing
+UPGRADES = [
+    ("categories", "product_count", _add_category_product_count),
+]
+
+# (table, backfill) run right after create_all creates the table
+BACKFILLS = [
+    ("attribute_facets", _backfill_attribute_facets),
+]
+
+# (table, index) dropped when present; superseded by another index
+DROPPED_INDEXES = [
+    ("attributes", "ix_attributes_name_value"),
+]
+
+
+def setup_schema(engine, metadata):
+    """Create missing tables, then apply upgrades; safe to run on every start."""
+    existing = set(inspect(engine).get_table_names())
+    metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for table, backfill in BACKFILLS:
+            # A fresh database has nothing to backfill from
+            if existing and table not in existing:
+                backfill(conn)
+                logger.info(f"Schema upgrade: backfilled {table}")
+    return upgrade_schema(engine, metadata)
+
+
+def upgrade_schema(engine, metadata):
+    """Apply pending column upgrades, create missing indexes and drop superseded ones.
+
+    Returns the names of the columns (``table.column``) and indexes added, and
+    of the indexes dropped prefixed with ``-``.
+    """
+    applied = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table, column, upgrade in UPGRADES:
+            if column in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            upgrade(conn)
+            applied.append(f"{table}.{column}")
+            logger.info(f"Schema upgrade: added {table}.{column}")
+
+        for table in metadata.sorted_tables:
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    applied.append(index.name)
+                    logger.info(f"Schema upgrade: created index {index.name}")
+
+        for table, index_name in DROPPED_INDEXES:
+            if index_name in {ix["name"] for ix in inspector.get_indexes(table)}:
+                conn.execute(text(f"DROP INDEX {index_name}"))
+                applied.append(f"-{index_name}")
+                logger.info(f"Schema upgrade: dropped index {index_name}")
+    return applied
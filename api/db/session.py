@@ -1,24 +1,105 @@
+from pathlib import Path
 from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
-from core.config import DATABASE_URL
+from services.metrics import instrument_engine
+from core.config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    ASYNC_READ_DATABASE_URL,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE,
+    SQLITE_TEMP_STORE,
+    SQLITE_BUSY_TIMEOUT,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    QUERY_PROFILING,
+)
 
-# Create engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+def engine_options(url: str) -> dict:
+    """Pool and connect options for ``url``'s dialect."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        }
+    options = {"connect_args": {"check_same_thread": False}}
+    if parsed.database and parsed.database != ":memory:":
+        # Local file: no stale server connections to recycle or ping
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
 
 
 # Enable WAL mode and related performance/consistency PRAGMAs for SQLite
-@event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     try:
         cursor.execute("PRAGMA journal_mode=WAL;")  # Improves concurrency
         cursor.execute("PRAGMA synchronous=NORMAL;")  # Safe with WAL, faster than FULL
         cursor.execute("PRAGMA foreign_keys=ON;")  # Enforce FK constraints
+        # Read-heavy profile: memory-mapped reads, a larger page cache, in-memory temp
+        # tables for sorts/GROUP BY, and waiting on a locked writer instead of failing
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE};")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE};")
+        cursor.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE};")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT};")
     finally:
         cursor.close()
 
 
+def ensure_sqlite_dir(dialect, conn_rec, cargs, cparams):
+    # Create the database file's directory on first connect rather than at import
+    database = cargs[0] if cargs else ""
+    if database and database != ":memory:" and not database.startswith("file:"):
+        Path(database).parent.mkdir(parents=True, exist_ok=True)
+
+
+def _configure_engine(sync_engine):
+    # Pragmas are SQLite-only; other dialects are tuned server-side
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "do_connect", ensure_sqlite_dir)
+        event.listen(sync_engine, "connect", set_sqlite_pragma)
+    if QUERY_PROFILING:
+        from services.profiling import profile_engine
+
+        profile_engine(sync_engine)
+    # Per-statement timings for /metrics
+    return instrument_engine(sync_engine)
+
+
+def make_engine(url: str):
+    return _configure_engine(create_engine(url, **engine_options(url)))
+
+
+def make_async_engine(url: str):
+    async_engine = create_async_engine(url, **engine_options(url))
+    _configure_engine(async_engine.sync_engine)
+    return async_engine
+
+
+# Create engines: sync for background threads and schema setup, async for request
+# handlers, and an async read engine for GET routes (the primary unless a replica is set)
+engine = make_engine(DATABASE_URL)
+async_engine = make_async_engine(ASYNC_DATABASE_URL)
+async_read_engine = make_async_engine(ASYNC_READ_DATABASE_URL) if ASYNC_READ_DATABASE_URL else async_engine
+
+
 # Session factory and Base
 SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=True)
+# Async sessions keep loaded state after commit; lazy loads are not allowed under asyncio
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
-
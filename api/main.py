@@ -1,19 +1,32 @@
 from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.exc import IntegrityError
 from contextlib import asynccontextmanager
 import time
 
-from core.config import APP_TITLE, APP_DESCRIPTION, APP_VERSION
+from core.config import APP_TITLE, APP_DESCRIPTION, APP_VERSION, QUERY_PROFILING
+from core.log import configure_logging
 from db import session as db_session
+from db.schema import setup_schema
 from products.router import router as products_router
 from categories.router import router as categories_router
 from attributes.router import router as attributes_router
 from services.meili import meili_service, logger
+from services.sync import start_background_sync, sync_status
+from services.indexing import index_outbox
+from services.health import health_probe
+from services.leader import startup_coordinator
+from services.cache import entity_cache
+from services.metrics import MetricsMiddleware, registry
 
 # Ensure models are imported so SQLAlchemy registers tables
 import products.model  # noqa: F401
 import categories.model  # noqa: F401
 import attributes.model  # noqa: F401
+import outbox.model  # noqa: F401
+
+configure_logging()
 
 
 @asynccontextmanager
@@ -22,52 +35,49 @@ async def lifespan(app: FastAPI):
     logger.info("Starting FastAPI application startup sequence")
     start_total = time.perf_counter()
 
-    try:
-        # Ensure Meilisearch indexes exist
-        created_indexes = meili_service.ensure_indexes_exist()
-
-        # Sync all DB data to Meilisearch
-        db = db_session.SessionLocal()
-        try:
-            product_count, category_count, attribute_count, sync_time = (
-                meili_service.sync_all_data(db)
-            )
-
-            created_str = (
-                ", created indexes: " + ", ".join(created_indexes)
-                if created_indexes
-                else ""
-            )
-            logger.info(
-                f"Completed Meilisearch resync in {sync_time:.1f} ms (products={product_count}, categories={category_count}, attributes={attribute_count}){created_str}"
-            )
-        finally:
-            db.close()
-
-    except Exception as e:
-        logger.error(f"[Startup Error] Could not connect to Meilisearch: {e}")
-        logger.warning(
-            "Continuing startup without Meilisearch sync. Search endpoints may be unavailable."
-        )
-        logger.info(
-            f"Startup complete in {(time.perf_counter() - start_total) * 1000:.1f} ms (skipped Meilisearch sync)"
-        )
-        yield
-        return
+    # With several workers only the elected leader creates tables and applies
+    # upgrades; the others wait here until it is done
+    is_leader = startup_coordinator.elect(
+        lambda: setup_schema(db_session.engine, db_session.Base.metadata)
+    )
+    if is_leader:
+        sync_status.on_change = startup_coordinator.publish
+        # A sync that failed because Meilisearch was down is retried once it answers
+        health_probe.owns_sync = True
+        # Index sync runs in the background so serving does not wait on the catalog size
+        start_background_sync()
+        # Router mutations are indexed write-behind by draining the search outbox;
+        # the sync holds the drainer until it is done, then the backlog is applied
+        index_outbox.start()
+    # Meilisearch health is polled in the background and feeds the circuit breaker
+    health_probe.start()
 
     logger.info(
-        f"Startup complete in {(time.perf_counter() - start_total) * 1000:.1f} ms"
+        f"Startup complete in {(time.perf_counter() - start_total) * 1000:.1f} ms "
+        f"({'Meilisearch sync running in background' if is_leader else 'follower; leader owns sync and outbox'})"
     )
     yield
-    # Shutdown (if needed)
+    # Shutdown: push any pending outbox rows before exiting
+    await health_probe.stop()
+    index_outbox.stop()
+    startup_coordinator.release()
+    await meili_service.aclose()
+    await db_session.async_engine.dispose()
+    if db_session.async_read_engine is not db_session.async_engine:
+        await db_session.async_read_engine.dispose()
 
 
 app = FastAPI(
     title=APP_TITLE, description=APP_DESCRIPTION, version=APP_VERSION, lifespan=lifespan
 )
 
-# Create all tables
-db_session.Base.metadata.create_all(bind=db_session.engine)
+# Latency, status and SQL work per route for /metrics
+app.add_middleware(MetricsMiddleware)
+if QUERY_PROFILING:
+    from services.profiling import QueryProfilerMiddleware
+
+    # Statement counts per request, N+1 warnings and the slow-query log
+    app.add_middleware(QueryProfilerMiddleware)
 
 # Include routers
 app.include_router(products_router)
@@ -80,18 +90,45 @@ app.include_router(attributes_router)
 async def integrity_error_handler(request, exc: IntegrityError):
     # Provide a cleaner message instead of 500
     detail = "Database integrity error"
-    if "FOREIGN KEY constraint failed" in str(exc.orig):
+    # SQLite: "FOREIGN KEY constraint failed"; Postgres: "violates foreign key constraint"
+    if "foreign key constraint" in str(exc.orig).lower():
         detail = "Referenced resource does not exist (foreign key constraint failed)."
     return Response(status_code=400, content=f"{detail}")
 
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to RapidStock API"}
 
 
 @app.get("/health")
-def health_check():
-    meili_status = meili_service.health_check()
-    overall = "healthy" if meili_status == "available" else "degraded"
-    return {"status": overall, "meilisearch": meili_status}
+async def health_check():
+    # Served from the background probe's last result; probe once if it has not run yet
+    if meili_service.last_health["checked_at"] is None:
+        await health_probe.check()
+    meili_health = meili_service.last_health
+    breaker = meili_service.breaker.snapshot()
+    # Followers report the leader's sync from the shared marker
+    sync = sync_status.snapshot()
+    if not startup_coordinator.is_leader:
+        sync = startup_coordinator.read() or sync
+    overall = (
+        "healthy"
+        if meili_health["status"] == "available" and breaker["state"] == "closed" and sync["state"] != "failed"
+        else "degraded"
+    )
+    return {
+        "status": overall,
+        "meilisearch": meili_health["status"],
+        "meilisearch_checked_at": meili_health["checked_at"],
+        "meilisearch_breaker": breaker,
+        "sync": sync,
+        "cache": entity_cache.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Some gauges query the database, so render off the event loop
+    body = await run_in_threadpool(registry.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from db.session import Base
+
+
+class SearchOutbox(Base):
+    """Pending Meilisearch change, written in the same transaction as the row it mirrors."""
+
+    __tablename__ = "search_outbox"
+    __table_args__ = {"sqlite_autoincrement": True}
+    id = Column(Integer, primary_key=True)
+    index_name = Column(String, nullable=False)
+    doc_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)  # "upsert" or "delete"
+    payload = Column(Text)  # JSON document for upserts
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class SearchOutboxDeadLetter(Base):
+    """Outbox row Meilisearch kept rejecting, set aside so it no longer blocks the queue."""
+
+    __tablename__ = "search_outbox_dead_letter"
+    id = Column(Integer, primary_key=True)  # id the row had in search_outbox
+    index_name = Column(String, nullable=False)
+    doc_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)
+    payload = Column(Text)
+    attempts = Column(Integer, nullable=False)
+    error = Column(Text)
+    created_at = Column(DateTime)
+    failed_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,46 @@
+# Attribute filters compiled to one grouped query over the attributes table
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, distinct, func, or_, select
+
+from attributes.model import Attribute
+
+# Upper bound on attribute predicates per request
+MAX_ATTRIBUTE_FILTERS = 20
+
+
+def parse_attribute_filters(pairs: Optional[List[str]]) -> Dict[str, List[str]]:
+    """Group repeated ``name:value`` parameters by name, keeping first-seen order."""
+    constraints: Dict[str, List[str]] = {}
+    for pair in pairs or []:
+        name, sep, value = pair.partition(":")
+        if not sep:
+            raise HTTPException(status_code=422, detail=f"Attribute filter {pair!r} must be name:value")
+        values = constraints.setdefault(name, [])
+        if value not in values:
+            values.append(value)
+    if sum(len(v) for v in constraints.values()) > MAX_ATTRIBUTE_FILTERS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_ATTRIBUTE_FILTERS} attribute filters per request")
+    return constraints
+
+
+def matching_product_ids(constraints: Dict[str, List[str]], after: Optional[int] = None):
+    """Select the ids of products that match every attribute name in ``constraints``.
+
+    Values listed for the same name are alternatives (color=red or color=blue);
+    different names must all match. Each ``(name, value)`` predicate is a seek
+    on ``ix_attributes_name_value_product``, which also carries product_id, so
+    the matching rows are read from the index alone and grouped per product:
+    a product qualifies when it matched as many distinct names as were asked
+    for. ``after`` restricts the scan to ids past a keyset cursor.
+    """
+    predicates = [
+        and_(Attribute.name == name, Attribute.value.in_(values)) for name, values in constraints.items()
+    ]
+    stmt = select(Attribute.product_id).where(or_(*predicates))
+    if after is not None:
+        stmt = stmt.where(Attribute.product_id > after)
+    return stmt.group_by(Attribute.product_id).having(
+        func.count(distinct(Attribute.name)) == len(constraints)
+    )
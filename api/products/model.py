@@ -8,7 +8,8 @@ class Product(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     description = Column(Text)
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
+    category = relationship("Category", back_populates="products")
     attributes = relationship(
         "Attribute", back_populates="product", cascade="all, delete-orphan"
     )
@@ -1,139 +1,472 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from collections import Counter
+from types import SimpleNamespace
+from typing import List, Optional
+import json
 
-from core.dependencies import get_db
+from core.dependencies import get_db, get_read_db
 from products.model import Product
 from categories.model import Category
+from categories.counts import adjust_product_counts
 from attributes.model import Attribute
-from products.schemas import ProductCreate, ProductOut
-from services.meili import meili_service
+from attributes.facets import adjust_facets, facet_counts, facet_deltas
+from products.schemas import ProductCreate, ProductOut, ProductBatch, BulkImportResult, BulkImportError
+from core.config import PRODUCT_INDEX, ATTRIBUTE_INDEX, BULK_IMPORT_CHUNK_SIZE, FAST_SERIALIZATION
+from services.indexing import index_outbox
+from services.meili import meili_service, batched
+from services.cache import entity_cache
+from services.documents import product_document, attribute_document, attribute_pair
+from shared.schemas import SearchPage
+from shared.pagination import (
+    keyset_page,
+    keyset_rows,
+    page_response,
+    parse_fields,
+    rows_response,
+    schema_columns,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+)
+from shared.export import export_response, EXPORT_CHUNK_SIZE, EXPORT_FORMAT_PATTERN
+from shared.cache import cached_entity
+from shared.batch import IDS_QUERY, parse_ids, load_by_ids
+from products.filters import parse_attribute_filters, matching_product_ids
+from shared.search import search_page, quote_filter_value, MAX_SEARCH_LIMIT
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 
+async def load_product(db: AsyncSession, product_id: int) -> Optional[Product]:
+    stmt = select(Product).options(selectinload(Product.attributes)).where(Product.id == product_id)
+    return (await db.scalars(stmt)).first()
+
+
+async def get_product_or_404(db: AsyncSession, product_id: int) -> Product:
+    product = await load_product(db, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+
 @router.post("/", response_model=ProductOut)
-def create_product(product: ProductCreate, db: Session = Depends(get_db)):
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_db)):
     # Validate category exists
-    category = db.query(Category).filter(Category.id == product.category_id).first()
+    category = await db.get(Category, product.category_id)
     if not category:
         raise HTTPException(status_code=400, detail=f"Category id {product.category_id} does not exist")
 
-    db_product = Product(name=product.name, description=product.description, category_id=product.category_id)
+    db_product = Product(
+        name=product.name,
+        description=product.description,
+        category_id=product.category_id,
+        attributes=[Attribute(name=attr.name, value=attr.value) for attr in product.attributes],
+    )
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
-
-    # Add attributes
-    new_attribute_docs = []
-    for attr in product.attributes:
-        db_attr = Attribute(name=attr.name, value=attr.value, product_id=db_product.id)
-        db.add(db_attr)
-        db.flush()  # get id before commit
-        new_attribute_docs.append({
-            "id": db_attr.id,
-            "name": db_attr.name,
-            "value": db_attr.value,
-            "product_id": db_attr.product_id
-        })
-    db.commit()
-    db.refresh(db_product)
-
-    # Index in Meilisearch
-    product_data = {
-        "id": db_product.id,
-        "name": db_product.name,
-        "description": db_product.description,
-        "category_id": db_product.category_id
-    }
-    meili_service.add_product(product_data)
-    if new_attribute_docs:
-        meili_service.add_attributes(new_attribute_docs)
+    await db.flush()  # get ids; product, attributes and outbox rows commit together
+    await adjust_product_counts(db, {product.category_id: 1})
+    await adjust_facets(db, facet_counts(db_product.attributes))
+
+    # Record Meilisearch changes in the outbox, same transaction
+    await index_outbox.upsert(db, PRODUCT_INDEX, [product_document(db_product, category)])
+    await index_outbox.upsert(db, ATTRIBUTE_INDEX, [attribute_document(a) for a in db_product.attributes])
+    await db.commit()
+    index_outbox.notify()
+    await entity_cache.invalidate(entity_cache.key("categories", product.category_id))
 
     return db_product
 
 
+async def read_import_rows(request: Request) -> list:
+    """Parse a bulk import body: a JSON array, or NDJSON (one object per line).
+
+    A malformed NDJSON line is kept as its ``ValueError``, so it is reported
+    with the other per-row errors instead of rejecting the whole body.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        rows = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                rows.append(e)
+        return rows
+    try:
+        rows = json.loads(body or b"[]")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed import body: {e}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Import body must be a JSON array or NDJSON")
+    return rows
+
+
+async def insert_rows(db: AsyncSession, model, rows: List[dict]) -> List[int]:
+    """Insert ``rows`` with multi-row statements and return their ids in order.
+
+    SQLite cannot return ids from a multi-row INSERT in parameter order, so
+    ``RETURNING ... sort_by_parameter_order`` would send one INSERT per row.
+    There the ids are assigned up front, past the current maximum; the
+    caller must already have written in this transaction, so SQLite's write
+    lock keeps other writers from taking the same ids.
+    """
+    if db.bind.dialect.name != "sqlite":
+        return list((await db.scalars(
+            insert(model).returning(model.id, sort_by_parameter_order=True), rows
+        )).all())
+    start = await db.scalar(select(func.max(model.id))) or 0
+    ids = list(range(start + 1, start + 1 + len(rows)))
+    await db.execute(insert(model.__table__), [{**row, "id": row_id} for row_id, row in zip(ids, rows)])
+    return ids
+
+
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_import_products(rows: list = Depends(read_import_rows), db: AsyncSession = Depends(get_db)):
+    errors = []
+    ids = []
+
+    # Validate every row up front
+    valid = []
+    for row_no, row in enumerate(rows):
+        if isinstance(row, ValueError):
+            errors.append(BulkImportError(row=row_no, error=f"Malformed JSON: {row}"))
+            continue
+        try:
+            valid.append((row_no, ProductCreate.model_validate(row)))
+        except ValidationError as e:
+            detail = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()
+            )
+            errors.append(BulkImportError(row=row_no, error=detail))
+
+    # Resolve all referenced categories with one query
+    category_ids = {p.category_id for _, p in valid}
+    # Plain copies: a failed chunk's rollback expires ORM instances, and reloading
+    # them lazily outside the greenlet would fail every later chunk
+    categories = {
+        c.id: SimpleNamespace(id=c.id, name=c.name)
+        for c in (await db.execute(select(Category.id, Category.name).where(Category.id.in_(category_ids))))
+    } if category_ids else {}
+    importable = []
+    for row_no, p in valid:
+        if p.category_id in categories:
+            importable.append((row_no, p))
+        else:
+            errors.append(BulkImportError(row=row_no, error=f"Category id {p.category_id} does not exist"))
+
+    for chunk in batched(importable, BULK_IMPORT_CHUNK_SIZE):
+        try:
+            # Written first: on SQLite this takes the write lock that insert_rows relies on
+            counted = await adjust_product_counts(db, Counter(p.category_id for _, p in chunk))
+            product_ids = await insert_rows(db, Product, [
+                {"name": p.name, "description": p.description, "category_id": p.category_id}
+                for _, p in chunk
+            ])
+            attribute_rows = [
+                {"name": a.name, "value": a.value, "product_id": product_id}
+                for product_id, (_, p) in zip(product_ids, chunk)
+                for a in p.attributes or []
+            ]
+            attribute_ids = await insert_rows(db, Attribute, attribute_rows) if attribute_rows else []
+
+            # Index documents go through the outbox in the same transaction
+            attributes = [
+                SimpleNamespace(id=attribute_id, **row)
+                for attribute_id, row in zip(attribute_ids, attribute_rows)
+            ]
+            by_product = {}
+            for a in attributes:
+                by_product.setdefault(a.product_id, []).append(a)
+            await index_outbox.upsert(db, PRODUCT_INDEX, [
+                product_document(
+                    SimpleNamespace(id=product_id, **p.model_dump(exclude={"attributes"})),
+                    categories[p.category_id],
+                    by_product.get(product_id, []),
+                )
+                for product_id, (_, p) in zip(product_ids, chunk)
+            ])
+            await index_outbox.upsert(db, ATTRIBUTE_INDEX, [attribute_document(a) for a in attributes])
+            await adjust_facets(db, facet_counts(attributes))
+            await db.commit()
+        except SQLAlchemyError as e:
+            await db.rollback()
+            errors.extend(BulkImportError(row=row_no, error=f"Database error: {e}") for row_no, _ in chunk)
+            continue
+        ids.extend(product_ids)
+        index_outbox.notify()
+        await entity_cache.invalidate(*(entity_cache.key("categories", c) for c in counted))
+
+    errors.sort(key=lambda e: e.row)
+    return BulkImportResult(created=len(ids), failed=len(errors), ids=ids, errors=errors)
+
+
+async def attach_attributes(db: AsyncSession, rows: List[dict]):
+    """Give each product row its attributes with one IN query, as selectinload does for ORM rows.
+
+    Rows are rebuilt in ``ProductOut`` field order, so their keys are encoded
+    in the same order as the response_model path.
+    """
+    by_product = {}
+    for i, row in enumerate(rows):
+        row["attributes"] = by_product.setdefault(row["id"], [])
+        rows[i] = {field: row[field] for field in ProductOut.model_fields if field in row}
+    if not by_product:
+        return
+    result = await db.execute(
+        select(Attribute.product_id, Attribute.name, Attribute.value, Attribute.id)
+        .where(Attribute.product_id.in_(list(by_product)))
+        .order_by(Attribute.product_id, Attribute.id)
+    )
+    for product_id, name, value, attribute_id in result:
+        by_product[product_id].append({"name": name, "value": value, "id": attribute_id})
+
+
+async def product_page(request, response, db, selected, cursor, limit, *criteria):
+    """One keyset page of products matching ``criteria``, serialized for a list route."""
+    with_attributes = selected is None or "attributes" in selected
+    if FAST_SERIALIZATION:
+        stmt = select(*schema_columns(Product, ProductOut, selected)).where(*criteria)
+        rows, next_cursor = await keyset_rows(db, stmt, Product.id, cursor, limit)
+        if with_attributes:
+            await attach_attributes(db, rows)
+        return rows_response(request, rows, next_cursor)
+    stmt = select(Product).where(*criteria)
+    if with_attributes:
+        # One extra IN query per page instead of a lazy load per product
+        stmt = stmt.options(selectinload(Product.attributes))
+    items, next_cursor = await keyset_page(db, stmt, Product.id, cursor, limit)
+    return page_response(request, response, items, next_cursor, ProductOut, selected)
+
+
 @router.get("/", response_model=List[ProductOut])
-def list_products(db: Session = Depends(get_db)):
-    products = db.query(Product).all()
-    return products
+async def list_products(
+        request: Request,
+        response: Response,
+        cursor: Optional[int] = Query(None, description="Return items with id greater than this"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+        db: AsyncSession = Depends(get_read_db),
+):
+    selected = parse_fields(fields, ProductOut)
+    return await product_page(request, response, db, selected, cursor, limit)
+
+
+@router.get("/filter", response_model=List[ProductOut])
+async def filter_products(
+        request: Request,
+        response: Response,
+        attribute: Optional[List[str]] = Query(None, description="name:value, repeatable"),
+        category_id: Optional[int] = None,
+        cursor: Optional[int] = Query(None, description="Return items with id greater than this"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+        db: AsyncSession = Depends(get_read_db),
+):
+    selected = parse_fields(fields, ProductOut)
+    constraints = parse_attribute_filters(attribute)
+    criteria = []
+    if constraints:
+        criteria.append(Product.id.in_(matching_product_ids(constraints, after=cursor)))
+    if category_id is not None:
+        criteria.append(Product.category_id == category_id)
+    return await product_page(request, response, db, selected, cursor, limit, *criteria)
+
+
+@router.get("/search", response_model=SearchPage)
+async def search_products(
+        q: str = "",
+        limit: int = Query(20, ge=1, le=MAX_SEARCH_LIMIT),
+        offset: int = Query(0, ge=0),
+        attributes_to_retrieve: Optional[List[str]] = Query(None, alias="attributesToRetrieve"),
+        category_id: Optional[int] = None,
+        product_id: Optional[int] = None,
+        category_name: Optional[str] = None,
+        attribute: Optional[List[str]] = Query(None, description="name:value, repeatable"),
+):
+    filters = []
+    if category_id is not None:
+        filters.append(f"category_id = {category_id}")
+    if product_id is not None:
+        filters.append(f"id = {product_id}")
+    if category_name is not None:
+        filters.append(f"category_name = {quote_filter_value(category_name)}")
+    for pair in attribute or []:
+        name, sep, value = pair.partition(":")
+        if not sep:
+            raise HTTPException(status_code=422, detail=f"Attribute filter {pair!r} must be name:value")
+        filters.append(f"attribute_pairs = {quote_filter_value(attribute_pair(name, value))}")
+    return await search_page(
+        meili_service.search_products,
+        q,
+        limit=limit,
+        offset=offset,
+        attributes_to_retrieve=attributes_to_retrieve,
+        filters=filters,
+    )
+
+
+@router.get("/export")
+async def export_products(
+        fmt: str = Query("ndjson", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+        category_id: Optional[int] = None,
+):
+    async def rows(db: AsyncSession):
+        stmt = select(Product).options(selectinload(Product.attributes))
+        if category_id is not None:
+            stmt = stmt.where(Product.category_id == category_id)
+        stmt = stmt.order_by(Product.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        async for p in await db.stream_scalars(stmt):
+            yield {
+                "id": p.id,
+                "name": p.name,
+                "description": p.description,
+                "category_id": p.category_id,
+                "attributes": [
+                    {"id": a.id, "name": a.name, "value": a.value} for a in p.attributes
+                ],
+            }
+
+    return export_response(
+        rows, fmt, ["id", "name", "description", "category_id", "attributes"], "products"
+    )
+
+
+@router.get("/batch", response_model=ProductBatch)
+async def get_products_batch(ids: str = IDS_QUERY, db: AsyncSession = Depends(get_read_db)):
+    # One IN query for the products plus one for all their attributes
+    stmt = select(Product).options(selectinload(Product.attributes))
+    items, missing = await load_by_ids(db, stmt, Product.id, parse_ids(ids))
+    return ProductBatch(items=items, missing=missing)
 
 
 @router.get("/{product_id}", response_model=ProductOut)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+async def get_product(product_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    # Misses fill the cache from the primary, since a lagging replica's row (and ETag)
+    # would be served until CACHE_TTL; the session only connects on a miss
+    return await cached_entity(
+        request,
+        "products",
+        product_id,
+        lambda: load_product(db, product_id),
+        ProductOut,
+        "Product not found",
+    )
+
+
+def diff_attributes(existing: List[Attribute], incoming) -> tuple:
+    """Match incoming attributes against a product's rows.
+
+    Exact name/value matches are left alone, remaining rows with a matching
+    name get their value updated in place, and whatever is left over is
+    inserted or deleted. Returns ``(changed, added, removed)``.
+    """
+    unmatched = list(existing)
+    pending = []
+    for attr in incoming:
+        match = next((a for a in unmatched if a.name == attr.name and a.value == attr.value), None)
+        if match is not None:
+            unmatched.remove(match)
+        else:
+            pending.append(attr)
+
+    changed, added = [], []
+    for attr in pending:
+        match = next((a for a in unmatched if a.name == attr.name), None)
+        if match is not None:
+            unmatched.remove(match)
+            match.value = attr.value
+            changed.append(match)
+        else:
+            added.append(Attribute(name=attr.name, value=attr.value))
+    return changed, added, unmatched
 
 
 @router.put("/{product_id}", response_model=ProductOut)
-def update_product(product_id: int, product: ProductCreate, db: Session = Depends(get_db)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
+async def update_product(product_id: int, product: ProductCreate, db: AsyncSession = Depends(get_db)):
+    db_product = await get_product_or_404(db, product_id)
 
     # Validate category exists
-    category = db.query(Category).filter(Category.id == product.category_id).first()
+    category = await db.get(Category, product.category_id)
     if not category:
         raise HTTPException(status_code=400, detail=f"Category id {product.category_id} does not exist")
 
     # Update product fields
+    old_category_id = db_product.category_id
+    product_changed = (
+        db_product.name != product.name
+        or db_product.description != product.description
+        or db_product.category_id != product.category_id
+    )
     db_product.name = product.name
     db_product.description = product.description
     db_product.category_id = product.category_id
 
-    # Remove old attributes
-    db.query(Attribute).filter(Attribute.product_id == product_id).delete(synchronize_session=False)
-    db.flush()
-
-    # Add new attributes
-    new_attribute_docs = []
-    for attr in product.attributes:
-        db_attr = Attribute(name=attr.name, value=attr.value, product_id=db_product.id)
-        db.add(db_attr)
-        db.flush()
-        new_attribute_docs.append({
-            "id": db_attr.id,
-            "name": db_attr.name,
-            "value": db_attr.value,
-            "product_id": db_attr.product_id
-        })
-    db.commit()
-    db.refresh(db_product)
-
-    # Upsert in Meilisearch
-    product_data = {
-        "id": db_product.id,
-        "name": db_product.name,
-        "description": db_product.description,
-        "category_id": db_product.category_id
-    }
-    meili_service.add_product(product_data)
-    if new_attribute_docs:
-        meili_service.add_attributes(new_attribute_docs)
+    # Touch only the attribute rows that actually changed
+    facets_before = facet_counts(db_product.attributes)
+    changed, added, removed = diff_attributes(db_product.attributes, product.attributes or [])
+    for attr in added:
+        db_product.attributes.append(attr)
+    for attr in removed:
+        db_product.attributes.remove(attr)  # delete-orphan deletes the row
+    await db.flush()
+    await adjust_facets(db, facet_deltas(facets_before, facet_counts(db_product.attributes)))
+    moved = []
+    if old_category_id != product.category_id:
+        moved = await adjust_product_counts(db, {old_category_id: -1, product.category_id: 1})
+
+    # Record exactly the Meilisearch changes in the outbox, same transaction
+    if product_changed or changed or added or removed:
+        await index_outbox.upsert(db, PRODUCT_INDEX, [product_document(db_product, category)])
+    await index_outbox.upsert(db, ATTRIBUTE_INDEX, [attribute_document(a) for a in changed + added])
+    await index_outbox.delete(db, ATTRIBUTE_INDEX, [a.id for a in removed])
+    await db.commit()
+    index_outbox.notify()
+    await entity_cache.invalidate(
+        entity_cache.key("products", product_id),
+        *(entity_cache.key("attributes", a.id) for a in changed + removed),
+        *(entity_cache.key("categories", c) for c in moved),
+    )
 
     return db_product
 
 
 @router.delete("/{product_id}", status_code=204)
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    db_product = await db.get(Product, product_id)
+    if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
+    category_id = db_product.category_id
 
-    # Collect related attribute IDs before deletion
-    attribute_ids = [a.id for a in product.attributes]
+    # Collect related attributes before deletion
+    attributes = (
+        await db.execute(
+            select(Attribute.id, Attribute.name, Attribute.value).where(Attribute.product_id == product_id)
+        )
+    ).all()
+    attribute_ids = [a.id for a in attributes]
 
     # Delete attributes then product
-    db.query(Attribute).filter(Attribute.product_id == product_id).delete(synchronize_session=False)
-    db.delete(product)
-    db.commit()
+    await db.execute(delete(Attribute).where(Attribute.product_id == product_id))
+    await db.execute(delete(Product).where(Product.id == product_id))
+    await adjust_product_counts(db, {category_id: -1})
+    await adjust_facets(db, {pair: -n for pair, n in facet_counts(attributes).items()})
 
-    # Update Meilisearch indexes
-    meili_service.delete_product(product_id)
-    if attribute_ids:
-        meili_service.delete_attributes(attribute_ids)
+    # Record Meilisearch deletes in the outbox, same transaction
+    await index_outbox.delete(db, PRODUCT_INDEX, [product_id])
+    await index_outbox.delete(db, ATTRIBUTE_INDEX, attribute_ids)
+    await db.commit()
+    index_outbox.notify()
+    await entity_cache.invalidate(
+        entity_cache.key("products", product_id),
+        entity_cache.key("categories", category_id),
+        *(entity_cache.key("attributes", a) for a in attribute_ids),
+    )
 
     return Response(status_code=204)
-
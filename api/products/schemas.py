@@ -17,3 +17,19 @@ class ProductOut(ProductCreate):
     class Config:
         from_attributes = True
 
+
+class ProductBatch(BaseModel):
+    items: List[ProductOut]
+    missing: List[int] = []
+
+
+class BulkImportError(BaseModel):
+    row: int
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    created: int
+    failed: int
+    ids: List[int] = []
+    errors: List[BulkImportError] = []
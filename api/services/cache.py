@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from core.config import CACHE_MAX_ENTRIES, CACHE_TTL, CACHE_URL
+from services.metrics import Counter, Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+# A cached entry is the serialized JSON body and its ETag
+Entry = Tuple[bytes, str]
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class MemoryBackend:
+    """Per-process LRU with a TTL on every entry."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    async def set(self, key: str, entry: Entry):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared cache for multi-worker deployments; needs the optional ``redis`` package."""
+
+    def __init__(self, url: str, ttl: float):
+        import redis.asyncio as redis
+
+        self.ttl = ttl
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Entry]:
+        value = await self._redis.get(key)
+        if value is None:
+            return None
+        etag, _, body = value.partition(b"\n")
+        return body, etag.decode()
+
+    async def set(self, key: str, entry: Entry):
+        body, etag = entry
+        await self._redis.set(key, etag.encode() + b"\n" + body, px=int(self.ttl * 1000))
+
+    async def delete(self, keys: Iterable[str]):
+        keys = list(keys)
+        if keys:
+            await self._redis.delete(*keys)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class EntityCache:
+    """Read-through cache of serialized entity responses.
+
+    Reads go through :meth:`get_or_load`; routers call :meth:`invalidate` with
+    the keys a write touched once it has committed. A load that overlaps an
+    invalidation is served but not stored, so a slow read cannot put back the
+    version a concurrent write just replaced.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @staticmethod
+    def key(kind: str, entity_id: int) -> str:
+        return f"{kind}:{entity_id}"
+
+    async def get_or_load(self, key: str, load) -> Optional[Entry]:
+        """Return ``(body, etag)`` for ``key``, calling ``await load()`` on a miss.
+
+        ``load`` returns the serialized body, or None when the entity does not exist.
+        """
+        try:
+            entry = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache read failed for {key}: {e}")
+            entry = None
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        generation = self._generation
+        body = await load()
+        if body is None:
+            return None
+        entry = (body, make_etag(body))
+        if generation == self._generation:
+            try:
+                await self.backend.set(key, entry)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Cache write failed for {key}: {e}")
+        return entry
+
+    async def invalidate(self, *keys: str):
+        self._generation += 1
+        self.invalidations += len(keys)
+        try:
+            await self.backend.delete(keys)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache invalidation failed for {', '.join(keys)}: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+def _make_backend():
+    if CACHE_URL:
+        try:
+            return RedisBackend(CACHE_URL, CACHE_TTL)
+        except ImportError:
+            logger.warning("CACHE_URL is set but the redis package is not installed; using the in-process cache")
+    return MemoryBackend(CACHE_MAX_ENTRIES, CACHE_TTL)
+
+
+# Global instance
+entity_cache = EntityCache(_make_backend())
+
+registry.register(Counter(
+    "entity_cache_requests_total", "Entity cache lookups by result.", ["result"],
+    collect=lambda: {("hit",): entity_cache.hits, ("miss",): entity_cache.misses},
+))
+registry.register(Counter(
+    "entity_cache_not_modified_total", "Entity reads answered with 304 Not Modified.",
+    collect=lambda: {(): entity_cache.not_modified},
+))
+registry.register(Counter(
+    "entity_cache_invalidations_total", "Entity cache keys evicted by writes.",
+    collect=lambda: {(): entity_cache.invalidations},
+))
+registry.register(Gauge(
+    "entity_cache_entries", "Entries held by the in-process entity cache.",
+    collect=lambda: {(): entity_cache.backend.size()} if entity_cache.backend.size() is not None else {},
+))
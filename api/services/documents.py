@@ -0,0 +1,70 @@
+# Builders for the documents pushed to each Meilisearch index
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+
+
+def attribute_pair(name, value) -> str:
+    return f"{name}:{value}"
+
+
+def product_document(product, category=None, attributes=None):
+    """Denormalized product document with its category name and attributes embedded.
+
+    ``category`` / ``attributes`` override the ORM relationships when the caller
+    already holds fresher objects than the session (e.g. mid-transaction).
+    """
+    if category is None:
+        category = product.category
+    if attributes is None:
+        attributes = product.attributes
+    return {
+        "id": product.id,
+        "name": product.name,
+        "description": product.description,
+        "category_id": product.category_id,
+        "category_name": category.name if category is not None else None,
+        "attributes": [{"name": a.name, "value": a.value} for a in attributes],
+        # Flattened "name:value" pairs so one filter can match a specific attribute value
+        "attribute_pairs": [attribute_pair(a.name, a.value) for a in attributes],
+    }
+
+
+def category_document(category):
+    return {
+        "id": category.id,
+        "name": category.name,
+        "description": category.description,
+    }
+
+
+def attribute_document(attribute):
+    return {
+        "id": attribute.id,
+        "name": attribute.name,
+        "value": attribute.value,
+        "product_id": attribute.product_id,
+    }
+
+
+def product_select():
+    """Product select with everything product_document needs loaded eagerly."""
+    from products.model import Product
+
+    return select(Product).options(
+        joinedload(Product.category), selectinload(Product.attributes)
+    )
+
+
+async def load_product_document(db, product_id):
+    """Flush pending changes and build the current document for ``product_id``."""
+    from products.model import Product
+
+    await db.flush()
+    product = (
+        await db.scalars(
+            product_select()
+            .where(Product.id == product_id)
+            .execution_options(populate_existing=True)
+        )
+    ).first()
+    return product_document(product) if product is not None else None
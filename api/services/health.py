@@ -0,0 +1,80 @@
+import asyncio
+import time
+from typing import Optional
+
+from core.config import MEILI_HEALTH_INTERVAL
+from services.breaker import CLOSED
+from services.indexing import index_outbox
+from services.meili import meili_service, logger
+from services.sync import start_background_sync, sync_status
+
+# Upper bound, in seconds, between retries of a failed startup sync
+SYNC_RETRY_MAX_BACKOFF = 300
+
+
+class HealthProbe:
+    """Polls Meilisearch in the background so ``/health`` never waits on it.
+
+    Every probe feeds the circuit breaker. When a probe closes a breaker that
+    was open, the outbox is told to drain the writes that queued up meanwhile.
+
+    In the worker that owns the index sync (``owns_sync``), a probe that finds
+    Meilisearch available while the last sync failed starts it again, backing
+    off between attempts, so an engine that was down at boot still ends up
+    with its indexes and settings.
+    """
+
+    def __init__(self, interval: float = MEILI_HEALTH_INTERVAL):
+        self.interval = interval
+        self.owns_sync = False
+        self._task: Optional[asyncio.Task] = None
+        self._sync_retries = 0
+        self._sync_retry_at = 0.0
+
+    async def check(self) -> str:
+        was_closed = meili_service.breaker.state == CLOSED
+        status = await meili_service.health_check_async()
+        if not was_closed and meili_service.breaker.state == CLOSED:
+            logger.info("Meilisearch is reachable again; resuming outbox drain")
+            index_outbox.resume()
+        if status == "available" and self.owns_sync:
+            self._retry_failed_sync()
+        return status
+
+    def _retry_failed_sync(self):
+        if sync_status.state != "failed":
+            if sync_status.state == "ready":
+                self._sync_retries = 0
+            return
+        now = time.monotonic()
+        if now < self._sync_retry_at:
+            return
+        self._sync_retries += 1
+        self._sync_retry_at = now + min(self.interval * 2 ** self._sync_retries, SYNC_RETRY_MAX_BACKOFF)
+        logger.info(f"Meilisearch is available; retrying the failed index sync (attempt {self._sync_retries})")
+        start_background_sync()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Meilisearch health probe failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="meili-health")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global instance
+health_probe = HealthProbe()
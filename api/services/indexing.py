@@ -0,0 +1,277 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable
+
+from core.config import INDEX_FLUSH_INTERVAL, INDEX_FLUSH_BATCH_SIZE, INDEX_MAX_BACKOFF, OUTBOX_MAX_ATTEMPTS
+from services.breaker import OPEN, CircuitOpenError
+from services.meili import meili_service, is_outage, logger
+from services.metrics import Counter, Gauge, registry
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+outbox_rows_flushed = registry.register(Counter(
+    "outbox_rows_flushed_total", "Outbox rows pushed to Meilisearch.",
+))
+outbox_flush_failures = registry.register(Counter(
+    "outbox_flush_failures_total", "Outbox drain batches that Meilisearch rejected.",
+))
+outbox_dead_letters = registry.register(Counter(
+    "outbox_dead_letters_total", "Outbox rows moved to search_outbox_dead_letter after repeated rejection.",
+))
+
+
+class IndexOutbox:
+    """Durable write-behind indexing backed by the ``search_outbox`` table.
+
+    Routers await :meth:`upsert` / :meth:`delete` with their own session before
+    committing, so the outbox rows land in the same transaction as the change
+    itself, then :meth:`notify` after the commit. A background thread drains
+    the table in id order, ``batch_size`` rows at a time, coalescing repeated
+    changes to the same document. Rows are only removed once Meilisearch has
+    accepted them; on failure they stay put and the drainer backs off, so an
+    outage replays exactly the missed changes once the engine is back. While
+    the Meilisearch circuit breaker is open the table is the pending queue:
+    the drainer leaves it alone until the health probe calls :meth:`resume`.
+    The startup sync puts the drainer on :meth:`hold` while it runs, so its
+    older snapshot cannot overwrite changes the drainer already pushed; the
+    rows written meanwhile are applied once it calls :meth:`release`.
+
+    A batch Meilisearch rejects outright (a 4xx, not an outage) is retried in
+    halves until the offending rows are alone; a single row rejected
+    ``max_attempts`` times is moved to ``search_outbox_dead_letter`` and
+    logged, so one bad document cannot block the queue.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = INDEX_FLUSH_INTERVAL,
+        batch_size: int = INDEX_FLUSH_BATCH_SIZE,
+        max_backoff: float = INDEX_MAX_BACKOFF,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        # Rows read per batch; shrinks while isolating rejected rows
+        self._limit = batch_size
+        self._failures = 0
+        self._retry_at = 0.0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._held = False
+
+    async def upsert(self, db, index_name, docs: Iterable[dict]):
+        await self._record(
+            db,
+            [
+                {"index_name": index_name, "doc_id": doc["id"], "op": UPSERT, "payload": json.dumps(doc)}
+                for doc in docs
+            ],
+        )
+
+    async def delete(self, db, index_name, ids: Iterable[int]):
+        await self._record(
+            db,
+            [{"index_name": index_name, "doc_id": doc_id, "op": DELETE, "payload": None} for doc_id in ids],
+        )
+
+    async def _record(self, db, rows):
+        from sqlalchemy import insert
+        from outbox.model import SearchOutbox
+
+        # One executemany inside the caller's transaction
+        if rows:
+            await db.execute(insert(SearchOutbox), rows)
+
+    def notify(self):
+        """Wake the drainer after committing outbox rows."""
+        with self._cond:
+            self._cond.notify()
+
+    def resume(self):
+        """Drop any backoff and drain now; called when Meilisearch comes back."""
+        with self._cond:
+            self._failures = 0
+            self._retry_at = 0.0
+            self._cond.notify()
+
+    def hold(self):
+        """Stop draining until :meth:`release`; rows keep accumulating in the table."""
+        with self._cond:
+            self._held = True
+
+    def release(self):
+        with self._cond:
+            self._held = False
+            self._cond.notify()
+
+    def pending_count(self) -> int:
+        from db import session as db_session
+        from outbox.model import SearchOutbox
+
+        db = db_session.SessionLocal()
+        try:
+            return db.query(SearchOutbox).count()
+        finally:
+            db.close()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="meili-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the drainer after a final drain attempt."""
+        with self._cond:
+            self._stopping = True
+            self._retry_at = 0.0
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+                if time.monotonic() < self._retry_at and not stopping:
+                    continue
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error(f"Outbox drain failed: {e}")
+            if stopping:
+                return
+
+    def drain(self) -> int:
+        """Push pending outbox rows until the table is empty or a batch fails.
+
+        Returns the number of outbox rows applied.
+        """
+        from db import session as db_session
+
+        if self._held:
+            return 0
+        # Rows wait in the table until the breaker lets calls through again
+        if meili_service.breaker.state == OPEN and meili_service.breaker.retry_after() > 0:
+            return 0
+        applied = 0
+        db = db_session.SessionLocal()
+        try:
+            while True:
+                limit = self._limit
+                sent = self._drain_batch(db)
+                if sent is None:
+                    return applied
+                applied += sent
+                # A smaller limit means the batch was split; retry the halves right away
+                if sent < limit and self._limit >= limit:
+                    return applied
+        finally:
+            db.close()
+
+    def _drain_batch(self, db):
+        from outbox.model import SearchOutbox
+
+        rows = db.query(SearchOutbox).order_by(SearchOutbox.id).limit(self._limit).all()
+        if not rows:
+            return 0
+
+        # Keep only the latest change per document, grouped by index
+        latest = OrderedDict()
+        for row in rows:
+            latest.pop((row.index_name, row.doc_id), None)
+            latest[(row.index_name, row.doc_id)] = row
+        by_index = OrderedDict()
+        for (index_name, doc_id), row in latest.items():
+            upserts, deletes = by_index.setdefault(index_name, ([], []))
+            if row.op == UPSERT:
+                upserts.append(json.loads(row.payload))
+            else:
+                deletes.append(doc_id)
+
+        t = time.perf_counter()
+        try:
+            for index_name, (upserts, deletes) in by_index.items():
+                meili_service.upsert_documents(index_name, upserts)
+                meili_service.delete_documents(index_name, deletes)
+        except CircuitOpenError as e:
+            # Nothing was sent, so the rows keep their attempt counts
+            self._retry_at = time.monotonic() + e.retry_after
+            logger.info(f"Outbox holding {len(rows)} changes while Meilisearch is unavailable")
+            return None
+        except Exception as e:
+            outbox_flush_failures.inc()
+            attempts = rows[0].attempts + 1
+            db.query(SearchOutbox).filter(SearchOutbox.id.in_([r.id for r in rows])).update(
+                {SearchOutbox.attempts: SearchOutbox.attempts + 1}, synchronize_session=False
+            )
+            db.commit()
+            if not is_outage(e):
+                if len(rows) > 1:
+                    # Meilisearch rejected the request itself: find the rows it objects to
+                    self._limit = max(1, len(rows) // 2)
+                    logger.warning(
+                        f"Meilisearch rejected an outbox batch of {len(rows)} changes, retrying in batches of {self._limit}: {e}"
+                    )
+                    return 0
+                if attempts >= self.max_attempts:
+                    self._dead_letter(db, rows[0], attempts, e)
+                    return 0
+            self._failures += 1
+            delay = min(self.flush_interval * (2 ** self._failures), self.max_backoff)
+            self._retry_at = time.monotonic() + delay
+            logger.warning(
+                f"Outbox flush of {len(rows)} changes failed (attempt {self._failures}, retrying in {delay:.1f} s): {e}"
+            )
+            return None
+
+        self._failures = 0
+        self._limit = min(self.batch_size, self._limit * 2)
+        outbox_rows_flushed.inc(amount=len(rows))
+        db.query(SearchOutbox).filter(SearchOutbox.id.in_([r.id for r in rows])).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        logger.debug(
+            f"Outbox flushed {len(rows)} changes ({len(latest)} documents) in {(time.perf_counter() - t) * 1000:.1f} ms"
+        )
+        return len(rows)
+
+    def _dead_letter(self, db, row, attempts, error):
+        from outbox.model import SearchOutbox, SearchOutboxDeadLetter
+
+        described = f"Outbox row {row.id} ({row.op} {row.index_name}/{row.doc_id})"
+        db.add(SearchOutboxDeadLetter(
+            id=row.id,
+            index_name=row.index_name,
+            doc_id=row.doc_id,
+            op=row.op,
+            payload=row.payload,
+            attempts=attempts,
+            error=str(error),
+            created_at=row.created_at,
+        ))
+        db.query(SearchOutbox).filter(SearchOutbox.id == row.id).delete(synchronize_session=False)
+        db.commit()
+        outbox_dead_letters.inc()
+        logger.error(f"{described} rejected {attempts} times; moved to search_outbox_dead_letter: {error}")
+
+
+# Global instance
+index_outbox = IndexOutbox()
+
+# Queried when /metrics renders
+registry.register(Gauge(
+    "outbox_pending_rows", "Outbox rows waiting to be pushed to Meilisearch.",
+    collect=lambda: {(): index_outbox.pending_count()},
+))
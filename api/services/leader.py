@@ -0,0 +1,100 @@
+"""Cross-process coordination of startup work for multi-worker deployments.
+
+With ``uvicorn --workers N`` or gunicorn every worker runs the app lifespan.
+:meth:`StartupCoordinator.elect` makes exactly one of them the leader: the
+first worker to start takes an exclusive ``flock`` on ``RUN_DIR/leader.lock``
+and holds it for its lifetime. The leader runs schema setup, the Meilisearch
+sync and the outbox drainer. The other workers block on ``startup.lock``
+until schema setup is done, then serve requests and report the leader's sync
+progress from the shared ``sync.json`` marker. If the leader exits, the next
+worker to start takes over.
+
+The locks are advisory file locks, so they coordinate workers on one host.
+Without ``fcntl`` (Windows) every process acts as its own leader.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from core.config import RUN_DIR
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class StartupCoordinator:
+    def __init__(self, run_dir: Path = RUN_DIR):
+        self.run_dir = Path(run_dir)
+        self.is_leader = False
+        self._leader_file = None
+
+    @property
+    def marker_path(self) -> Path:
+        return self.run_dir / "sync.json"
+
+    def elect(self, setup) -> bool:
+        """Decide this process's role; the leader runs ``setup()`` while the others wait for it.
+
+        Returns True in the leader.
+        """
+        if fcntl is None or self._leader_file is not None:
+            # No cross-process locking, or this process already leads (lifespan re-entered)
+            self.is_leader = True
+            setup()
+            return True
+
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.run_dir / "startup.lock", "a") as startup_lock:
+            # Serializes elections: a worker only gets here once the previous
+            # leader candidate has finished its setup
+            fcntl.flock(startup_lock, fcntl.LOCK_EX)
+            try:
+                leader_file = open(self.run_dir / "leader.lock", "a")
+                try:
+                    fcntl.flock(leader_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    leader_file.close()
+                    self.is_leader = False
+                    logger.info(f"Worker {os.getpid()} is a follower; schema setup and index sync run in the leader")
+                    return False
+
+                self._leader_file = leader_file
+                self.is_leader = True
+                logger.info(f"Worker {os.getpid()} is the startup leader")
+                # Replace the previous boot's marker before any follower can read it
+                self.publish({"state": "pending", "leader_pid": os.getpid()})
+                setup()
+                return True
+            finally:
+                fcntl.flock(startup_lock, fcntl.LOCK_UN)
+
+    def release(self):
+        if self._leader_file is not None:
+            self._leader_file.close()
+            self._leader_file = None
+        self.is_leader = False
+
+    def publish(self, status: dict):
+        """Atomically replace the shared sync-status marker."""
+        if fcntl is None:
+            return
+        tmp = self.marker_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({**status, "leader_pid": os.getpid()}))
+        os.replace(tmp, self.marker_path)
+
+    def read(self) -> Optional[dict]:
+        """The leader's last published sync status, or None if there is none yet."""
+        try:
+            return json.loads(self.marker_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+
+# Global instance
+startup_coordinator = StartupCoordinator()
@@ -1,8 +1,33 @@
-import meilisearch
+import hashlib
+import json
 import logging
+import threading
 import time
-from typing import List
-from core.config import MEILI_URL, MEILI_KEY, PRODUCT_INDEX, CATEGORY_INDEX, ATTRIBUTE_INDEX
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional
+from services.breaker import BREAKER_STATES, CircuitBreaker
+from services.metrics import Counter, Gauge, meili_errors, registry, track_meili
+from core.config import (
+    MEILI_URL,
+    MEILI_KEY,
+    MEILI_TIMEOUT,
+    MEILI_WRITE_TIMEOUT,
+    MEILI_HEALTH_TIMEOUT,
+    MEILI_BREAKER_FAILURES,
+    MEILI_BREAKER_RESET,
+    PRODUCT_INDEX,
+    CATEGORY_INDEX,
+    ATTRIBUTE_INDEX,
+    MEILI_SYNC_MODE,
+    MEILI_SYNC_BATCH_SIZE,
+    MEILI_SYNC_CONCURRENCY,
+)
+
+if TYPE_CHECKING:
+    import httpx
+    import meilisearch
 
 # Logger setup for Meilisearch sync
 logger = logging.getLogger("meili_sync")
@@ -15,26 +40,165 @@ if not logger.handlers:
     logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
+# Field stored on every indexed document so incremental sync can detect changes
+HASH_FIELD = "content_hash"
+# Page size used when reading back ids/hashes already held by an index
+HASH_FETCH_LIMIT = 1000
+# How long ensure_indexes_exist waits for settings updates to be applied
+SETTINGS_WAIT_MS = 60_000
+
+# Index settings applied by ensure_indexes_exist. Searchable and displayed
+# attributes are listed explicitly so HASH_FIELD (and the attribute_pairs copy
+# of attributes) is never matched by a query, and search hits leave the hash out.
+# Document fetches ignore displayedAttributes, so incremental sync still reads it.
+INDEX_SETTINGS = {
+    PRODUCT_INDEX: {
+        "searchableAttributes": ["name", "description", "category_name", "attributes"],
+        "displayedAttributes": [
+            "id", "name", "description", "category_id", "category_name", "attributes", "attribute_pairs",
+        ],
+        "filterableAttributes": ["id", "category_id", "category_name", "attribute_pairs"],
+        "sortableAttributes": ["id", "name"],
+    },
+    CATEGORY_INDEX: {
+        "searchableAttributes": ["name", "description"],
+        "displayedAttributes": ["id", "name", "description"],
+        "filterableAttributes": ["id"],
+        "sortableAttributes": ["id", "name"],
+    },
+    ATTRIBUTE_INDEX: {
+        "searchableAttributes": ["name", "value"],
+        "displayedAttributes": ["id", "name", "value", "product_id"],
+        "filterableAttributes": ["id", "name", "product_id"],
+        "sortableAttributes": ["id", "name"],
+    },
+}
+
+
+def content_hash(doc) -> str:
+    payload = {k: v for k, v in doc.items() if k != HASH_FIELD}
+    raw = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def with_hash(doc):
+    return {**doc, HASH_FIELD: content_hash(doc)}
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def is_outage(exc: Exception) -> bool:
+    """Whether ``exc`` means Meilisearch is unreachable or failing, as opposed to rejecting the request."""
+    import httpx
+    import meilisearch
+
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    if isinstance(exc, meilisearch.errors.MeilisearchApiError):
+        return exc.status_code >= 500
+    return True
+
 
 class MeilisearchService:
+    """Meilisearch access for the sync, the outbox and request handlers.
+
+    Constructing the service is cheap: both HTTP clients (and the libraries
+    behind them) are created on first use, so importing the app does not pay
+    for them.
+    """
+
     def __init__(self):
+        self._client: Optional["meilisearch.Client"] = None
+        self._client_lock = threading.Lock()
+        # Request handlers talk to Meilisearch through a non-blocking client, created on first use
+        self._async_client: Optional["httpx.AsyncClient"] = None
+        # Searches and outbox writes go through the breaker; the startup sync has its own retry story
+        self.breaker = CircuitBreaker("meilisearch", MEILI_BREAKER_FAILURES, MEILI_BREAKER_RESET)
+        # Last result of health_check_async, reported by /health
+        self.last_health = {"status": "unknown", "checked_at": None, "latency_ms": None}
+
+    @property
+    def client(self) -> "meilisearch.Client":
+        """Official (blocking) client used by the sync and outbox threads, created on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._make_client()
+        return self._client
+
+    @staticmethod
+    def _make_client() -> "meilisearch.Client":
+        import meilisearch
+
         # Use official client; it will send Authorization: Bearer <key> after we patch headers
-        self.client = meilisearch.Client(MEILI_URL, MEILI_KEY or None)
+        client = meilisearch.Client(MEILI_URL, MEILI_KEY or None, timeout=MEILI_WRITE_TIMEOUT)
         try:
             # Prefer Authorization bearer header for your instance
             if (
-                hasattr(self.client, "http")
-                and hasattr(self.client.http, "headers")
+                hasattr(client, "http")
+                and hasattr(client.http, "headers")
                 and MEILI_KEY
             ):
-                self.client.http.headers.pop("X-Meili-API-Key", None)
-                self.client.http.headers["Authorization"] = f"Bearer {MEILI_KEY}"
+                client.http.headers.pop("X-Meili-API-Key", None)
+                client.http.headers["Authorization"] = f"Bearer {MEILI_KEY}"
         except Exception:
             # Non-fatal; fallback to default headers
             pass
+        return client
+
+    @property
+    def async_client(self) -> "httpx.AsyncClient":
+        if self._async_client is None:
+            import httpx
+
+            headers = {"Authorization": f"Bearer {MEILI_KEY}"} if MEILI_KEY else {}
+            self._async_client = httpx.AsyncClient(
+                base_url=MEILI_URL, headers=headers, timeout=MEILI_TIMEOUT
+            )
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
 
+    @contextmanager
+    def guarded(self):
+        """Fail fast while the breaker is open and report the outcome of the wrapped call to it."""
+        self.breaker.check()
+        try:
+            yield
+        except Exception as e:
+            if is_outage(e):
+                self._record_outage(e)
+            else:
+                # Meilisearch answered, it just did not like the request
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+
+    def _record_outage(self, exc: Exception):
+        if self.breaker.record_failure():
+            logger.warning(
+                f"Meilisearch circuit opened after {self.breaker.failures} consecutive failures "
+                f"({exc!r}); searches fail fast and index writes wait in the outbox"
+            )
+
+    @track_meili("ensure_indexes_exist")
     def ensure_indexes_exist(self) -> List[str]:
+        import meilisearch
+
         created_indexes: List[str] = []
+        settings_tasks = []
         try:
             for idx in [PRODUCT_INDEX, CATEGORY_INDEX, ATTRIBUTE_INDEX]:
                 t_idx = time.perf_counter()
@@ -49,136 +213,268 @@ class MeilisearchService:
                     logger.info(
                         f"Created missing index '{idx}' in {(time.perf_counter() - t_idx) * 1000:.1f} ms"
                     )
+                # Settings updates are idempotent tasks; Meilisearch skips no-op changes
+                settings_tasks.append(self.client.index(idx).update_settings(INDEX_SETTINGS[idx]))
+            # Incremental sync filters on id, which only works once the settings are applied
+            for task in settings_tasks:
+                try:
+                    self.client.wait_for_task(task.task_uid, timeout_in_ms=SETTINGS_WAIT_MS)
+                except meilisearch.errors.MeilisearchTimeoutError:
+                    logger.warning(f"Index settings task {task.task_uid} is still running")
             return created_indexes
         except Exception as e:
             logger.error(f"Could not connect to Meilisearch at {MEILI_URL}: {e}")
             raise
 
-    def sync_all_data(self, db_session):
+    @track_meili("fetch_indexed_hashes")
+    def _fetch_indexed_hashes(
+        self, index_name, after: Optional[int] = None, until: Optional[int] = None
+    ) -> Dict[int, Optional[str]]:
+        """Ids and content hashes held by ``index_name`` with ``after < id <= until``.
+
+        Either bound may be None; ``id`` is filterable in every index.
+        """
+        index = self.client.index(index_name)
+        bounds = []
+        if after is not None:
+            bounds.append(f"id > {after}")
+        if until is not None:
+            bounds.append(f"id <= {until}")
+        params = {"fields": ["id", HASH_FIELD], "limit": HASH_FETCH_LIMIT}
+        if bounds:
+            params["filter"] = " AND ".join(bounds)
+        hashes: Dict[int, Optional[str]] = {}
+        offset = 0
+        while True:
+            page = index.get_documents({**params, "offset": offset})
+            for doc in page.results:
+                fields = dict(doc)
+                hashes[fields["id"]] = fields.get(HASH_FIELD)
+            offset += len(page.results)
+            if not page.results or offset >= page.total:
+                return hashes
+
+    @track_meili("add_documents_batch")
+    def _send_batch(self, index_name, batch_no, docs):
+        t = time.perf_counter()
+        self.client.index(index_name).add_documents(docs)
+        logger.info(
+            f"[{index_name}] batch {batch_no}: sent {len(docs)} docs in {(time.perf_counter() - t) * 1000:.1f} ms"
+        )
+
+    def _sync_index(
+        self, index_name, docs, full: bool, batch_size: int, concurrency: int, on_progress=None
+    ):
+        """Stream ``docs`` into ``index_name`` in batches.
+
+        ``on_progress(index_name, rows_seen)`` is called after every batch.
+        Returns (rows seen, documents upserted, documents deleted).
+        """
+        index = self.client.index(index_name)
+        if full:
+            index.delete_all_documents()
+
+        # Incremental mode compares each batch with the documents the index holds for
+        # the same id range, so memory stays bounded by the batch size (plus whatever
+        # stale documents fall in that range) rather than growing with the catalog.
+        # ``docs`` must come in ascending id order.
+        total = upserted = deleted = 0
+        last_id = None
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = deque()
+            for batch_no, batch in enumerate(batched(docs, batch_size), start=1):
+                total += len(batch)
+                if on_progress:
+                    on_progress(index_name, total)
+                batch = [with_hash(d) for d in batch]
+                if not full:
+                    indexed = self._fetch_indexed_hashes(index_name, after=last_id, until=batch[-1]["id"])
+                    last_id = batch[-1]["id"]
+                    batch = [d for d in batch if indexed.pop(d["id"], None) != d[HASH_FIELD]]
+                    # Ids in this range that are no longer in the database
+                    deleted += self._delete_stale(index, list(indexed), batch_size)
+                if not batch:
+                    continue
+                upserted += len(batch)
+                # Bound memory: wait for the oldest batch before queueing another
+                if len(in_flight) >= concurrency:
+                    in_flight.popleft().result()
+                in_flight.append(pool.submit(self._send_batch, index_name, batch_no, batch))
+            for future in in_flight:
+                future.result()
+
+        if not full:
+            # Everything past the last database row is stale
+            stale = self._fetch_indexed_hashes(index_name, after=last_id)
+            deleted += self._delete_stale(index, list(stale), batch_size)
+        return total, upserted, deleted
+
+    @staticmethod
+    def _delete_stale(index, ids, batch_size) -> int:
+        for chunk in batched(ids, batch_size):
+            index.delete_documents(chunk)
+        return len(ids)
+
+    @track_meili("sync_all_data")
+    def sync_all_data(
+        self,
+        db_session,
+        full: Optional[bool] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        on_progress=None,
+    ):
         from products.model import Product
         from categories.model import Category
         from attributes.model import Attribute
+        from services.documents import (
+            product_document,
+            category_document,
+            attribute_document,
+            product_select,
+        )
+
+        if full is None:
+            full = MEILI_SYNC_MODE == "full"
+        batch_size = batch_size or MEILI_SYNC_BATCH_SIZE
+        # At least one batch in flight; 0 or a negative setting would stall the pipeline
+        concurrency = max(1, concurrency or MEILI_SYNC_CONCURRENCY)
 
-        logger.info("Beginning full SQLite -> Meilisearch resync")
+        logger.info(
+            f"Beginning {'full' if full else 'incremental'} SQLite -> Meilisearch resync "
+            f"(batch_size={batch_size}, concurrency={concurrency})"
+        )
         t_sync_start = time.perf_counter()
 
         # Products
         t = time.perf_counter()
-        products = db_session.query(Product).all()
-        product_docs = [
-            {
-                "id": p.id,
-                "name": p.name,
-                "description": p.description,
-                "category_id": p.category_id,
-            }
-            for p in products
-        ]
-        self.client.index(PRODUCT_INDEX).delete_all_documents()
-        if product_docs:
-            self.client.index(PRODUCT_INDEX).add_documents(product_docs)
+        product_docs = (
+            product_document(p)
+            for p in db_session.scalars(
+                product_select().order_by(Product.id).execution_options(yield_per=batch_size)
+            )
+        )
+        product_count, upserted, deleted = self._sync_index(
+            PRODUCT_INDEX, product_docs, full, batch_size, concurrency, on_progress
+        )
         logger.info(
-            f"Synced {len(product_docs)} products in {(time.perf_counter() - t) * 1000:.1f} ms"
+            f"Synced {product_count} products ({upserted} upserted, {deleted} deleted) in {(time.perf_counter() - t) * 1000:.1f} ms"
         )
 
         # Categories
         t = time.perf_counter()
-        categories = db_session.query(Category).all()
-        category_docs = [
-            {"id": c.id, "name": c.name, "description": c.description}
-            for c in categories
-        ]
-        self.client.index(CATEGORY_INDEX).delete_all_documents()
-        if category_docs:
-            self.client.index(CATEGORY_INDEX).add_documents(category_docs)
+        category_docs = (
+            category_document(c)
+            for c in db_session.query(Category).order_by(Category.id).yield_per(batch_size)
+        )
+        category_count, upserted, deleted = self._sync_index(
+            CATEGORY_INDEX, category_docs, full, batch_size, concurrency, on_progress
+        )
         logger.info(
-            f"Synced {len(category_docs)} categories in {(time.perf_counter() - t) * 1000:.1f} ms"
+            f"Synced {category_count} categories ({upserted} upserted, {deleted} deleted) in {(time.perf_counter() - t) * 1000:.1f} ms"
         )
 
         # Attributes
         t = time.perf_counter()
-        attributes = db_session.query(Attribute).all()
-        attribute_docs = [
-            {"id": a.id, "name": a.name, "value": a.value, "product_id": a.product_id}
-            for a in attributes
-        ]
-        self.client.index(ATTRIBUTE_INDEX).delete_all_documents()
-        if attribute_docs:
-            self.client.index(ATTRIBUTE_INDEX).add_documents(attribute_docs)
+        attribute_docs = (
+            attribute_document(a)
+            for a in db_session.query(Attribute).order_by(Attribute.id).yield_per(batch_size)
+        )
+        attribute_count, upserted, deleted = self._sync_index(
+            ATTRIBUTE_INDEX, attribute_docs, full, batch_size, concurrency, on_progress
+        )
         logger.info(
-            f"Synced {len(attribute_docs)} attributes in {(time.perf_counter() - t) * 1000:.1f} ms"
+            f"Synced {attribute_count} attributes ({upserted} upserted, {deleted} deleted) in {(time.perf_counter() - t) * 1000:.1f} ms"
         )
 
         total_time = (time.perf_counter() - t_sync_start) * 1000
-        return len(product_docs), len(category_docs), len(attribute_docs), total_time
+        return product_count, category_count, attribute_count, total_time
 
-    def add_product(self, product_data):
-        try:
-            self.client.index(PRODUCT_INDEX).add_documents([product_data])
-        except Exception as e:
-            logger.warning(
-                f"Meilisearch indexing failed for product {product_data.get('id')}: {e}"
-            )
+    @track_meili("upsert_documents")
+    def upsert_documents(self, index_name, docs):
+        """Add or replace ``docs`` in ``index_name``; errors propagate to the caller."""
+        if docs:
+            with self.guarded():
+                self.client.index(index_name).add_documents([with_hash(d) for d in docs])
 
-    def add_category(self, category_data):
-        try:
-            self.client.index(CATEGORY_INDEX).add_documents([category_data])
-        except Exception as e:
-            logger.warning(
-                f"Meilisearch indexing failed for category {category_data.get('id')}: {e}"
-            )
+    @track_meili("delete_documents")
+    def delete_documents(self, index_name, ids):
+        if ids:
+            with self.guarded():
+                self.client.index(index_name).delete_documents(list(ids))
 
-    def delete_category(self, category_id):
-        try:
-            self.client.index(CATEGORY_INDEX).delete_document(category_id)
-        except Exception as e:
-            logger.warning(
-                f"Failed to delete category {category_id} from Meilisearch: {e}"
-            )
-
-    def add_attributes(self, attribute_docs):
-        try:
-            if attribute_docs:
-                self.client.index(ATTRIBUTE_INDEX).add_documents(attribute_docs)
-        except Exception as e:
-            logger.warning(f"Meilisearch indexing failed for attributes: {e}")
-
-    def delete_product(self, product_id):
-        try:
-            self.client.index(PRODUCT_INDEX).delete_document(product_id)
-        except Exception as e:
-            logger.warning(
-                f"Failed to delete product {product_id} from Meilisearch: {e}"
-            )
+    @track_meili("search")
+    async def search(
+        self,
+        index_name,
+        query,
+        limit: int = 20,
+        offset: int = 0,
+        attributes_to_retrieve: Optional[List[str]] = None,
+        filters: Optional[List[str]] = None,
+        sort: Optional[List[str]] = None,
+    ):
+        """Run a paginated search; ``filters`` are ANDed together."""
+        body = {"q": query, "limit": limit, "offset": offset}
+        if attributes_to_retrieve:
+            body["attributesToRetrieve"] = attributes_to_retrieve
+        if filters:
+            body["filter"] = filters
+        if sort:
+            body["sort"] = sort
+        with self.guarded():
+            response = await self.async_client.post(f"/indexes/{index_name}/search", json=body)
+            response.raise_for_status()
+        return response.json()
 
-    def delete_attributes(self, attribute_ids):
-        try:
-            if attribute_ids:
-                self.client.index(ATTRIBUTE_INDEX).delete_documents(attribute_ids)
-        except Exception as e:
-            logger.warning(
-                f"Failed to delete {len(attribute_ids)} attribute docs from Meilisearch: {e}"
-            )
-
-    def search_products(self, query):
-        results = self.client.index(PRODUCT_INDEX).search(query)
-        return results.get("hits", [])
+    async def search_products(self, query, **params):
+        return await self.search(PRODUCT_INDEX, query, **params)
 
-    def search_categories(self, query):
-        results = self.client.index(CATEGORY_INDEX).search(query)
-        return results.get("hits", [])
+    async def search_categories(self, query, **params):
+        return await self.search(CATEGORY_INDEX, query, **params)
 
-    def search_attributes(self, query):
-        results = self.client.index(ATTRIBUTE_INDEX).search(query)
-        return results.get("hits", [])
+    async def search_attributes(self, query, **params):
+        return await self.search(ATTRIBUTE_INDEX, query, **params)
 
+    @track_meili("health_check")
     def health_check(self):
         try:
             ms_health = self.client.health()
             return ms_health.get("status", "unknown")
         except Exception:
+            meili_errors.inc("health_check")
             return "unavailable"
 
+    @track_meili("health_check")
+    async def health_check_async(self):
+        """Probe Meilisearch, feed the result to the breaker and cache it in ``last_health``."""
+        t = time.perf_counter()
+        try:
+            response = await self.async_client.get("/health", timeout=MEILI_HEALTH_TIMEOUT)
+            response.raise_for_status()
+            status = response.json().get("status", "unknown")
+            self.breaker.record_success()
+        except Exception as e:
+            meili_errors.inc("health_check")
+            if is_outage(e):
+                self._record_outage(e)
+            status = "unavailable"
+        self.last_health = {
+            "status": status,
+            "checked_at": time.time(),
+            "latency_ms": round((time.perf_counter() - t) * 1000, 1),
+        }
+        return status
+
 
 # Global instance
 meili_service = MeilisearchService()
+
+registry.register(Gauge(
+    "meili_breaker_state", "1 for the current state of the Meilisearch circuit breaker.", ["state"],
+    collect=lambda: {(s,): float(meili_service.breaker.state == s) for s in BREAKER_STATES},
+))
+registry.register(Counter(
+    "meili_breaker_rejections_total", "Meilisearch calls rejected while the circuit was open.",
+    collect=lambda: {(): meili_service.breaker.rejected},
+))
@@ -0,0 +1,289 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters, gauges and histograms are plain thread-safe objects registered on
+``registry``; ``GET /metrics`` renders them. Request latency comes from
+:class:`MetricsMiddleware`, SQL timings from engine events
+(:func:`instrument_engine`), and Meilisearch timings from
+:func:`track_meili`. SQL statements are attributed to the request that ran
+them through a context variable set by the middleware; statements issued by
+background threads are labelled ``route="background"`` with an empty method.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from services.breaker import CircuitOpenError
+
+# Seconds; the Prometheus client defaults plus finer steps for fast SQL statements
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _Value(_Metric):
+    def __init__(self, *args, collect=None, **kwargs):
+        """``collect()`` may return ``{labels_tuple: value}`` to read values owned elsewhere at render time."""
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+        self._collect = collect
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        if self._collect is not None:
+            values.update(self._collect())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, k)} {v:g}" for k, v in sorted(values.items())
+        ]
+
+
+class Counter(_Value):
+    kind = "counter"
+
+
+class Gauge(_Value):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, *labels, value: float):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self.header()
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]:g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status.",
+    ["method", "route", "status"],
+))
+http_requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served.",
+))
+
+# SQL
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Duration of individual SQL statements by route.", ["method", "route"],
+))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "Number of SQL statements executed per request.", ["method", "route"],
+    buckets=COUNT_BUCKETS,
+))
+db_time_per_request = registry.register(Histogram(
+    "db_time_per_request_seconds", "Total SQL time spent per request.", ["method", "route"],
+))
+
+# Meilisearch
+meili_request_duration = registry.register(Histogram(
+    "meili_request_duration_seconds", "Latency of MeilisearchService calls by method.", ["method"],
+))
+meili_errors = registry.register(Counter(
+    "meili_errors_total", "Failed MeilisearchService calls by method.", ["method"],
+))
+
+
+class _RequestStats:
+    __slots__ = ("query_seconds",)
+
+    def __init__(self):
+        self.query_seconds = []
+
+
+_request_stats: contextvars.ContextVar[Optional[_RequestStats]] = contextvars.ContextVar(
+    "request_stats", default=None
+)
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and SQL work per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = _RequestStats()
+        token = _request_stats.set(stats)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_progress.dec()
+            _request_stats.reset(token)
+            # The route template is only known once routing ran, so SQL timings are
+            # collected during the request and labelled here
+            method, route = scope["method"], _route_template(scope)
+            http_request_duration.observe(method, route, str(status["code"]), value=elapsed)
+            for seconds in stats.query_seconds:
+                db_query_duration.observe(method, route, value=seconds)
+            db_queries_per_request.observe(method, route, value=len(stats.query_seconds))
+            db_time_per_request.observe(method, route, value=sum(stats.query_seconds))
+
+
+def instrument_engine(sync_engine):
+    """Time every statement on ``sync_engine`` and attribute it to the current request."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.query_seconds.append(elapsed)
+        else:
+            db_query_duration.observe("", "background", value=elapsed)
+
+    return sync_engine
+
+
+def track_meili(method: str):
+    """Decorator timing a MeilisearchService method, sync or async, and counting failures.
+
+    Calls rejected by an open circuit breaker never reached Meilisearch and are
+    left out; ``meili_breaker_rejections_total`` counts them.
+    """
+
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                rejected = False
+                try:
+                    return await fn(*args, **kwargs)
+                except CircuitOpenError:
+                    rejected = True
+                    raise
+                except Exception:
+                    meili_errors.inc(method)
+                    raise
+                finally:
+                    if not rejected:
+                        meili_request_duration.observe(method, value=time.perf_counter() - started)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            rejected = False
+            try:
+                return fn(*args, **kwargs)
+            except CircuitOpenError:
+                rejected = True
+                raise
+            except Exception:
+                meili_errors.inc(method)
+                raise
+            finally:
+                if not rejected:
+                    meili_request_duration.observe(method, value=time.perf_counter() - started)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,159 @@
+"""Request-scoped SQL profiling: N+1 detection, slow-query log and query budgets.
+
+Enabled with ``QUERY_PROFILING=true``. :class:`QueryProfilerMiddleware`
+collects every statement a request runs (via ``before_cursor_execute``
+listeners added by :func:`profile_engine`), logs statements slower than
+``SLOW_QUERY_MS`` with their route, and warns when one statement shape
+repeats ``N_PLUS_ONE_THRESHOLD`` or more times in a request, the signature
+of a per-row lazy load. Responses carry ``X-Query-Count`` and
+``X-Query-Time-Ms`` headers.
+
+:func:`query_budget` works without the middleware and is meant for tests
+and benchmark scripts::
+
+    with query_budget(3):
+        client.get("/products/?limit=100")
+"""
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from core.config import SLOW_QUERY_MS, N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+# Expanded IN lists and multi-row VALUES differ only in their number of placeholders
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize ``statement`` so executions that differ only in their parameters compare equal."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _PLACEHOLDER_LIST.sub("(?, ...)", shape)
+    return _NUMBER.sub("N", shape)
+
+
+class QueryLog:
+    """Statements executed in one request (or one :func:`query_budget` block)."""
+
+    def __init__(self):
+        self.statements: List[tuple] = []  # (statement, seconds)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def seconds(self) -> float:
+        return sum(s for _, s in self.statements)
+
+    def repeated_shapes(self, threshold: int):
+        shapes = Counter(statement_shape(stmt) for stmt, _ in self.statements)
+        return [(shape, n) for shape, n in shapes.most_common() if n >= threshold]
+
+
+_query_log: contextvars.ContextVar[Optional[QueryLog]] = contextvars.ContextVar("query_log", default=None)
+# Request being profiled, for log lines written mid-request
+_current_route: contextvars.ContextVar[str] = contextvars.ContextVar("current_route", default="background")
+
+
+def profile_engine(sync_engine):
+    """Log slow statements on ``sync_engine`` and record them into the active request's QueryLog."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["profile_start"].pop()
+        log = _query_log.get()
+        if log is not None:
+            log.statements.append((statement, elapsed))
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            logger.warning(
+                f"Slow query ({elapsed * 1000:.1f} ms) in {_current_route.get()}: {_WHITESPACE.sub(' ', statement)[:500]}"
+            )
+
+    return sync_engine
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware reporting per-request statement counts and N+1 patterns."""
+
+    def __init__(self, app, threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        log = QueryLog()
+        log_token = _query_log.set(log)
+        route_token = _current_route.set(f"{scope['method']} {scope['path']}")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(log.count).encode()))
+                headers.append((b"x-query-time-ms", f"{log.seconds * 1000:.2f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _query_log.reset(log_token)
+            _current_route.reset(route_token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            for shape, n in log.repeated_shapes(self.threshold):
+                logger.warning(
+                    f"Possible N+1 in {scope['method']} {route}: {n} executions of {shape[:300]}"
+                )
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, engines=None):
+    """Fail if the block runs more than ``max_queries`` statements.
+
+    Counts statements on ``engines`` (default: every engine in ``db.session``)
+    from any thread, so background work running concurrently is counted too.
+    Yields the :class:`QueryLog` for further assertions.
+    """
+    from db import session as db_session
+
+    if engines is None:
+        engines = {
+            db_session.engine,
+            db_session.async_engine.sync_engine,
+            db_session.async_read_engine.sync_engine,
+        }
+    log = QueryLog()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        log.statements.append((statement, 0.0))
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield log
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", _record)
+
+    if log.count > max_queries:
+        listing = "\n".join(f"  {statement_shape(s)}" for s, _ in log.statements)
+        raise QueryBudgetExceeded(f"{log.count} queries executed, budget was {max_queries}:\n{listing}")
@@ -0,0 +1,136 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from services.indexing import index_outbox
+from services.meili import meili_service, logger
+from services.metrics import Counter, Gauge, registry
+
+SYNC_STATES = ("pending", "syncing", "ready", "failed")
+
+
+class SyncStatus:
+    """Thread-safe progress of the background SQLite -> Meilisearch sync."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "pending"
+        self.counts: Dict[str, int] = {}
+        self.created_indexes = []
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.duration_ms: Optional[float] = None
+        # Called with a snapshot when a sync starts or finishes, to share it with other workers
+        self.on_change: Optional[Callable[[dict], None]] = None
+
+    def _changed(self):
+        if self.on_change is not None:
+            try:
+                self.on_change(self.snapshot())
+            except Exception as e:
+                logger.warning(f"Could not publish sync status: {e}")
+
+    def start(self):
+        with self._lock:
+            self.state = "syncing"
+            self.counts = {}
+            self.error = None
+            self.started_at = time.time()
+            self.duration_ms = None
+        self._changed()
+
+    def progress(self, index_name, rows_seen):
+        with self._lock:
+            self.counts[index_name] = rows_seen
+
+    def finish(self, duration_ms, error: Optional[str] = None):
+        with self._lock:
+            self.state = "failed" if error else "ready"
+            self.error = error
+            self.duration_ms = round(duration_ms, 1)
+        self._changed()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "counts": dict(self.counts),
+                "created_indexes": list(self.created_indexes),
+                "error": self.error,
+                "started_at": self.started_at,
+                "duration_ms": self.duration_ms,
+            }
+
+
+sync_status = SyncStatus()
+
+sync_runs = registry.register(Counter(
+    "meili_sync_runs_total", "Completed SQLite -> Meilisearch syncs by result.", ["result"],
+))
+registry.register(Gauge(
+    "meili_sync_state", "1 for the current sync state.", ["state"],
+    collect=lambda: {(s,): float(sync_status.state == s) for s in SYNC_STATES},
+))
+registry.register(Gauge(
+    "meili_sync_rows", "Rows read by the current or last sync, by index.", ["index"],
+    collect=lambda: {(k,): v for k, v in sync_status.snapshot()["counts"].items()},
+))
+registry.register(Gauge(
+    "meili_sync_duration_seconds", "Duration of the last completed sync.",
+    collect=lambda: {(): (sync_status.duration_ms or 0) / 1000},
+))
+
+
+def run_sync(full: Optional[bool] = None):
+    """Resync every index from the database, holding the outbox drainer meanwhile.
+
+    The sync reads a snapshot of the tables; if the drainer pushed a newer
+    change while the sync was still sending older rows, the older document
+    would win. Changes made during the sync stay in the outbox and are
+    applied after it.
+    """
+    from db import session as db_session
+
+    index_outbox.hold()
+    sync_status.start()
+    t_start = time.perf_counter()
+    try:
+        sync_status.created_indexes = meili_service.ensure_indexes_exist()
+
+        db = db_session.SessionLocal()
+        try:
+            product_count, category_count, attribute_count, sync_time = (
+                meili_service.sync_all_data(
+                    db, full=full, on_progress=sync_status.progress
+                )
+            )
+        finally:
+            db.close()
+
+        created_str = (
+            ", created indexes: " + ", ".join(sync_status.created_indexes)
+            if sync_status.created_indexes
+            else ""
+        )
+        logger.info(
+            f"Completed Meilisearch resync in {sync_time:.1f} ms (products={product_count}, categories={category_count}, attributes={attribute_count}){created_str}"
+        )
+        sync_status.finish((time.perf_counter() - t_start) * 1000)
+        sync_runs.inc("success")
+    except Exception as e:
+        logger.error(f"[Sync Error] Meilisearch resync failed: {e}")
+        logger.warning("Search results may be stale until the next successful sync.")
+        sync_status.finish((time.perf_counter() - t_start) * 1000, error=str(e))
+        sync_runs.inc("failure")
+    finally:
+        index_outbox.release()
+
+
+def start_background_sync(full: Optional[bool] = None) -> threading.Thread:
+    # Hold the drainer before the thread runs, so it cannot slip a drain in first
+    index_outbox.hold()
+    thread = threading.Thread(
+        target=run_sync, kwargs={"full": full}, name="meili-sync", daemon=True
+    )
+    thread.start()
+    return thread
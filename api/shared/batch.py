@@ -0,0 +1,33 @@
+# Multi-get by id for the batch read endpoints
+from typing import List, Tuple
+
+from fastapi import HTTPException, Query
+
+# Upper bound on ids per batch request; keeps the IN list well under SQLite's bound-parameter limit
+MAX_BATCH_IDS = 500
+
+IDS_QUERY = Query(..., description=f"Comma-separated ids, at most {MAX_BATCH_IDS}")
+
+
+def parse_ids(ids: str) -> List[int]:
+    """Parse a comma-separated id list, dropping repeats but keeping request order."""
+    try:
+        values = [int(v) for v in ids.split(",") if v.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be comma-separated integers")
+    unique = list(dict.fromkeys(values))
+    if not unique:
+        raise HTTPException(status_code=422, detail="ids must not be empty")
+    if len(unique) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return unique
+
+
+async def load_by_ids(db, stmt, id_column, ids: List[int]) -> Tuple[list, List[int]]:
+    """Fetch rows for ``ids`` with one ``IN`` query.
+
+    Returns ``(rows, missing)``: rows in the order of ``ids`` and the ids that
+    matched nothing.
+    """
+    found = {row.id: row for row in await db.scalars(stmt.where(id_column.in_(ids)))}
+    return [found[i] for i in ids if i in found], [i for i in ids if i not in found]
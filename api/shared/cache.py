@@ -0,0 +1,34 @@
+# Cached, ETag-aware responses for single-entity reads
+from fastapi import HTTPException, Request, Response
+
+from services.cache import entity_cache
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {c.strip().removeprefix("W/") for c in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def cached_entity(request: Request, kind: str, entity_id: int, load, schema, not_found: str):
+    """Serve ``schema`` of the row returned by ``await load()`` from the entity cache.
+
+    Returns 304 when the client's ``If-None-Match`` already holds the current ETag.
+    """
+
+    async def serialize():
+        row = await load()
+        return schema.model_validate(row).model_dump_json().encode() if row is not None else None
+
+    entry = await entity_cache.get_or_load(entity_cache.key(kind, entity_id), serialize)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    body, etag = entry
+    # Clients must revalidate, which is cheap: a match is answered without a body
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        entity_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,85 @@
+# Streaming NDJSON/CSV export helpers
+import csv
+import io
+import json
+from typing import AsyncIterator, Callable, List
+
+from fastapi.responses import StreamingResponse
+
+# Rows read per database round-trip and encoded per response chunk
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+EXPORT_FORMAT_PATTERN = "^(ndjson|csv)$"
+
+
+async def _session_rows(rows: Callable) -> AsyncIterator[dict]:
+    # The export outlives the request's session, so it owns its own (on the replica, if any)
+    from db import session as db_session
+
+    async with db_session.AsyncReadSessionLocal() as db:
+        async for row in rows(db):
+            yield row
+
+
+async def _ndjson_chunks(rows: AsyncIterator[dict], chunk_size: int):
+    lines = []
+    first = True
+    async for row in rows:
+        lines.append(json.dumps(row, default=str))
+        # Flush the first row on its own so clients see the first byte immediately
+        if first or len(lines) >= chunk_size:
+            first = False
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def _csv_chunks(rows: AsyncIterator[dict], fieldnames: List[str], chunk_size: int):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    # Send the header straight away so clients see the first byte immediately
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    count = 0
+    async for row in rows:
+        writer.writerow(
+            {k: json.dumps(v) if isinstance(v, (list, dict)) else v for k, v in row.items()}
+        )
+        count += 1
+        if count >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if count:
+        yield buffer.getvalue()
+
+
+def export_response(
+    rows: Callable,
+    fmt: str,
+    fieldnames: List[str],
+    filename: str,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> StreamingResponse:
+    """Stream the async generator ``rows(db)`` as NDJSON or CSV.
+
+    Nested values are JSON-encoded in CSV cells.
+    """
+    source = _session_rows(rows)
+    if fmt == "csv":
+        body = _csv_chunks(source, fieldnames, chunk_size)
+    else:
+        body = _ndjson_chunks(source, chunk_size)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
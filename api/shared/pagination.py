@@ -0,0 +1,110 @@
+# Keyset pagination and sparse field selection for list endpoints
+from functools import lru_cache
+from typing import Optional, Set
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from shared.responses import FastJSONResponse
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+async def keyset_page(db, stmt, id_column, cursor: Optional[int], limit: int):
+    """Return up to ``limit`` rows with ``id > cursor`` and the cursor for the next page."""
+    if cursor is not None:
+        stmt = stmt.where(id_column > cursor)
+    rows = (await db.scalars(stmt.order_by(id_column).limit(limit + 1))).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+async def keyset_rows(db, stmt, id_column, cursor: Optional[int], limit: int):
+    """:func:`keyset_page` for a Core select of columns; rows come back as plain dicts.
+
+    Nothing is added to the session's identity map, and the rows can be
+    encoded without going through a response model.
+    """
+    if cursor is not None:
+        stmt = stmt.where(id_column > cursor)
+    result = await db.execute(stmt.order_by(id_column).limit(limit + 1))
+    rows = [dict(row) for row in result.mappings()]
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]["id"]
+    return rows, None
+
+
+def schema_columns(model, schema, fields: Optional[Set[str]]):
+    """Table columns of ``model`` backing the selected fields of ``schema``, in schema order."""
+    table = model.__table__
+    return [
+        table.c[f] for f in schema.model_fields
+        if f in table.c and (fields is None or f in fields)
+    ]
+
+
+def parse_fields(fields: Optional[str], schema) -> Optional[Set[str]]:
+    """Parse a comma-separated ``fields`` parameter; ``id`` is always included."""
+    if not fields:
+        return None
+    selected = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = selected - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    return selected | {"id"}
+
+
+@lru_cache(maxsize=None)
+def _field_adapter(schema, field: str) -> TypeAdapter:
+    return TypeAdapter(schema.model_fields[field].annotation)
+
+
+def project(item, schema, fields: Set[str]) -> dict:
+    """Serialize only ``fields`` of an ORM row, so unselected relationships are never loaded."""
+    projected = {}
+    for field in (f for f in schema.model_fields if f in fields):
+        adapter = _field_adapter(schema, field)
+        value = adapter.validate_python(getattr(item, field), from_attributes=True)
+        projected[field] = adapter.dump_python(value, mode="json")
+    return projected
+
+
+def next_page_headers(request: Request, next_cursor: Optional[int]) -> dict:
+    headers = {}
+    if next_cursor is not None:
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        headers["X-Next-Cursor"] = str(next_cursor)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return headers
+
+
+def page_response(
+    request: Request,
+    response: Response,
+    items,
+    next_cursor: Optional[int],
+    schema,
+    fields: Optional[Set[str]],
+):
+    """Attach next-page headers and apply field projection.
+
+    Without ``fields`` the ORM rows are returned for the route's response_model;
+    with ``fields`` they are serialized here and returned as a JSONResponse.
+    """
+    headers = next_page_headers(request, next_cursor)
+    if fields is None:
+        response.headers.update(headers)
+        return items
+    content = [project(item, schema, fields) for item in items]
+    return JSONResponse(content, headers=headers)
+
+
+def rows_response(request: Request, rows, next_cursor: Optional[int]):
+    """Encode a page from :func:`keyset_rows` directly; the rows already have the response shape."""
+    return FastJSONResponse(rows, headers=next_page_headers(request, next_cursor))
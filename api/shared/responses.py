@@ -0,0 +1,26 @@
+# JSON encoding for responses built from plain rows
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is the fallback
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson when it is installed.
+
+    The content is encoded as-is: it must already be JSON-ready (dicts, lists,
+    strings, numbers, None), as rows read from a Core select are.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
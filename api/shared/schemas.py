@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+
+class SearchPage(BaseModel):
+    query: str
+    hits: List[Dict[str, Any]]
+    limit: int
+    offset: int
+    estimated_total_hits: Optional[int] = None
+    processing_time_ms: Optional[int] = None
@@ -0,0 +1,43 @@
+# Shared helpers for the Meilisearch-backed search endpoints
+import logging
+import math
+
+from fastapi import HTTPException
+
+from services.breaker import CircuitOpenError
+from shared.schemas import SearchPage
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the ``limit`` query parameter of search endpoints
+MAX_SEARCH_LIMIT = 100
+
+
+def quote_filter_value(value: str) -> str:
+    """Quote a string for use on the right-hand side of a Meilisearch filter."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+async def search_page(search, query: str, **params) -> SearchPage:
+    """Await a ``meili_service.search_*`` method and shape the result as a SearchPage."""
+    try:
+        results = await search(query, **params)
+    except CircuitOpenError as e:
+        # Meilisearch is known to be down; fail fast without logging every request
+        raise HTTPException(
+            status_code=503,
+            detail="Search is temporarily unavailable",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    except Exception as e:
+        logger.warning(f"Search for {query!r} failed: {e!r}")
+        raise HTTPException(status_code=503, detail="Search is temporarily unavailable")
+    return SearchPage(
+        query=query,
+        hits=results.get("hits", []),
+        limit=results.get("limit", params.get("limit", 0)),
+        offset=results.get("offset", params.get("offset", 0)),
+        estimated_total_hits=results.get("estimatedTotalHits"),
+        processing_time_ms=results.get("processingTimeMs"),
+    )